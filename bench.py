@@ -0,0 +1,162 @@
+"""
+Benchmarks for the encode and decode hot paths on CPython and the
+MicroPython unix port:
+
+    python bench.py [name ...]
+    micropython bench.py [name ...]
+
+Only benchmarks containing one of the given names are run. Reports the
+operations per second and the bytes allocated per operation, counted with
+gc.mem_alloc on MicroPython and as the tracemalloc peak of a single
+operation on CPython.
+"""
+
+import gc
+import sys
+
+from ubeacon import BeaconFilter, classify, decode, ticks_diff, ticks_us
+from ubeacon.altbeacon import AltBeacon
+from ubeacon.eddystone import EddystoneUID, EddystoneURL
+from ubeacon.ibeacon import IBeacon
+from ubeacon.lintech import LinTechBeacon
+from ubeacon.mikrotik import MikroTik
+from ubeacon.ruuvitag import RuuviTag
+
+try:
+    import tracemalloc
+except ImportError:  # MicroPython
+    tracemalloc = None
+
+
+# Minimum time to run each benchmark
+DURATION_US = 500_000
+
+# Operations to count the allocations with gc.mem_alloc
+ALLOC_OPS = 100
+
+UUID = "acbdf5ff-d272-45f5-8e45-01672fe51c47"
+
+RUUVITAG_ADV_DATA = (
+    b"\x02\x01\x06\x1b\xff\x99\x04\x05\x12\xfcS\x94\xc3|\x00\x04\xff\xfc\x04"
+    b"\x0c\xac6B\x00\xcd\xcb\xb83L\x88O"
+)
+MIKROTIK_ADV_DATA = (
+    b"\x02\x01\x06\x15\xffO\t\x01\x00\xce\xa6\x00\x00\x00\x00\x02\x00\xa0\x1c"
+    b"\x91\x08W\x00\x00_"
+)
+
+
+def allocated(func):
+    """Bytes allocated per call of func"""
+    if tracemalloc is None:
+        gc.collect()
+        gc.disable()
+        before = gc.mem_alloc()
+        for _ in range(ALLOC_OPS):
+            func()
+        after = gc.mem_alloc()
+        gc.enable()
+        return (after - before) / ALLOC_OPS
+
+    tracemalloc.start()
+    func()
+    tracemalloc.reset_peak()
+    current, _ = tracemalloc.get_traced_memory()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak - current
+
+
+def run(name, func):
+    """Double the number of calls until they take DURATION_US"""
+    func()
+    calls = 1
+    while True:
+        gc.collect()
+        start = ticks_us()
+        for _ in range(calls):
+            func()
+        elapsed = ticks_diff(ticks_us(), start)
+        if elapsed >= DURATION_US:
+            break
+        calls *= 2
+
+    print(
+        "{:<36s} {:>12.0f} ops/s {:>8.1f} B/op".format(
+            name, calls * 1_000_000 / elapsed, allocated(func)
+        )
+    )
+
+
+def encode_benchmarks(beacon):
+    """Encode from scratch, update a field and rebuild the response data"""
+    name = beacon.__class__.__name__
+    rssi = beacon.reference_rssi
+
+    def update():
+        beacon.reference_rssi = rssi - 1 if beacon.reference_rssi == rssi else rssi
+        return beacon.adv_data
+
+    def resp_bytes():
+        beacon.name = b"bench"
+        return beacon.resp_bytes
+
+    benchmarks = [
+        (name + ".encode", beacon.encode),
+        (name + ".adv_data", update),
+        (name + ".resp_bytes", resp_bytes),
+    ]
+    if "minor" in beacon._RAW_FIELDS:
+        minors = range(1000)
+        benchmarks.append(
+            (name + ".encode_many 1000", lambda: beacon.encode_many(minor=minors))
+        )
+    return benchmarks
+
+
+def decode_benchmarks(beacon_class, adv_data):
+    """Decode into a reused beacon and detect the beacon type"""
+    name = beacon_class.__name__
+    beacon = beacon_class(adv_data=adv_data)
+    return [
+        (name + ".decode", lambda: beacon.decode(adv_data)),
+        (name + " decode()", lambda: decode(adv_data)),
+        (name + " classify()", lambda: classify(adv_data)),
+    ]
+
+
+def benchmarks():
+    beacons = [
+        IBeacon(uuid=UUID, major=1337, minor=21),
+        AltBeacon(uuid=UUID, major=1337, minor=21),
+        LinTechBeacon(major=1337, minor=21),
+        EddystoneUID(namespace="85b9ae954b59c3d6f69d", instance="000000001337"),
+        EddystoneURL(url="https://micropython.org"),
+    ]
+
+    for beacon in beacons:
+        yield from encode_benchmarks(beacon)
+
+    for beacon in beacons:
+        yield from decode_benchmarks(beacon.__class__, bytes(beacon.adv_data))
+    yield from decode_benchmarks(RuuviTag, RUUVITAG_ADV_DATA)
+    yield from decode_benchmarks(MikroTik, MIKROTIK_ADV_DATA)
+
+    beacon = beacons[0]
+    adv_data = bytes(beacon.adv_data)
+    beacon_filter = BeaconFilter(uuid=UUID, major=[17, 1337])
+    pattern = beacon_filter.pattern(IBeacon)
+    yield "BeaconFilter.match", lambda: beacon_filter.match(beacon)
+    yield "BytePattern.match", lambda: pattern.match(adv_data)
+
+
+def main(names):
+    print(sys.implementation.name, sys.version)
+    for name, func in benchmarks():
+        if not names or any(n in name for n in names):
+            run(name, func)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
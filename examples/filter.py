@@ -7,7 +7,6 @@ from ubeacon import BeaconFilter
 from ubeacon.ibeacon import IBeacon
 
 
-_IBEACON_UUID = const(0x004C)
 _SCAN_DURATION_MS = const(0)
 
 
@@ -19,15 +18,15 @@ async def scan():
         major=1337,
     )
 
+    # Compile the filter to a byte pattern matching the iBeacon advertising data
+    pattern = beacon_filter.pattern(IBeacon)
+
     async with aioble.scan(_SCAN_DURATION_MS) as scanner:
         async for result in scanner:
-            for mfg_id, _ in result.manufacturer():
-                if mfg_id == _IBEACON_UUID:
-                    beacon = IBeacon(adv_data=result.adv_data)
-
-                    # Proceed if the beacon match the filter
-                    if beacon_filter.match(beacon):
-                        print(f"MAC: {hexlify(result.device.addr)} Beacon: {beacon,!r}")
+            # Only decode the beacon if the advertising data match the filter
+            if pattern.match(result.adv_data):
+                beacon = IBeacon(adv_data=result.adv_data)
+                print(f"MAC: {hexlify(result.device.addr)} Beacon: {beacon,!r}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,45 @@
+import aioble
+import asyncio
+
+from binascii import hexlify
+
+from ubeacon import BeaconFilter
+from ubeacon.cache import SightingCache
+from ubeacon.ibeacon import IBeacon
+from ubeacon.pipeline import AsyncPipeline, Sighting, decoded, fanout, matching_adv
+
+
+_SCAN_DURATION_MS = const(0)
+
+
+def log(sighting):
+    print(f"MAC: {hexlify(sighting.addr)} Beacon: {sighting.beacon,!r}")
+
+
+async def scan():
+    # Only decode iBeacons with the uuid
+    beacon_filter = BeaconFilter(uuid="7dc04cb6-ed25-420a-ae02-f31674a1f946")
+
+    # Emit each beacon again after 10 seconds or when the advertising data changed
+    cache = SightingCache(maxsize=64, ttl_ms=10_000, suppress=True)
+
+    async with aioble.scan(
+        _SCAN_DURATION_MS, interval_us=30000, window_us=30000
+    ) as scanner:
+        sightings = AsyncPipeline(
+            scanner,
+            Sighting.from_scan_result,
+            matching_adv(beacon_filter.pattern(IBeacon)),
+            decoded(cache),
+            fanout(log),
+        )
+
+        async for sighting in sightings:
+            pass
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(scan())
+    except KeyboardInterrupt:
+        aioble.stop()
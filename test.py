@@ -1,12 +1,46 @@
+import asyncio
 import unittest
 
-from ubeacon import Beacon
+from ubeacon import (
+    UUID,
+    AdvPayload,
+    Beacon,
+    BeaconFilter,
+    classify,
+    decode,
+    decode_batch,
+    instrument,
+)
 from ubeacon.lintech import LinTechBeacon
 from ubeacon.ibeacon import IBeacon
 from ubeacon.mikrotik import MikroTik
 from ubeacon.ruuvitag import RuuviTag
 from ubeacon.altbeacon import AltBeacon
-from ubeacon.eddystone import EddystoneUID, EddystoneURL
+from ubeacon.eddystone import (
+    EddystoneAggregator,
+    EddystoneEID,
+    EddystoneTLM,
+    EddystoneUID,
+    EddystoneURL,
+)
+from ubeacon.advertiser import Advertiser
+from ubeacon.assembler import ADV_IND, ADV_NONCONN_IND, SCAN_RSP, ScanAssembler
+from ubeacon.cache import SightingCache
+from ubeacon.filters import FilterIndex
+from ubeacon.pipeline import (
+    AsyncPipeline,
+    Sighting,
+    decoded,
+    fanout,
+    matching,
+    matching_adv,
+    pipeline,
+)
+from ubeacon.capture import CaptureReader, CaptureWriter, check_header, records
+from ubeacon.replay import merge, read_binary, replay, replay_capture, to_json
+from ubeacon.scanner import ScannerService
+from ubeacon.stats import DecodeStats
+from ubeacon.tracker import EVENT_ENTER, EVENT_EXIT, EVENT_UPDATE, BeaconTracker
 
 
 class ValidationTest(unittest.TestCase):
@@ -27,6 +61,27 @@ class ValidationTest(unittest.TestCase):
         self.assertRaises(ValueError, beacon.validate, [1], 1)
 
 
+class UUIDTest(unittest.TestCase):
+
+    uuid = "acbdf5ff-d272-45f5-8e45-01672fe51c47"
+    uuid_bytes = b"\xac\xbd\xf5\xff\xd2rE\xf5\x8eE\x01g/\xe5\x1cG"
+
+    def test_str(self):
+        self.assertEqual(str(UUID(self.uuid_bytes)), self.uuid)
+
+    def test_eq(self):
+        uuid = UUID(self.uuid_bytes)
+        self.assertEqual(uuid, UUID(self.uuid_bytes))
+        self.assertEqual(uuid, self.uuid_bytes)
+        self.assertNotEqual(uuid, self.uuid)
+        self.assertNotEqual(uuid, "no-uuid")
+        self.assertNotEqual(uuid, 1)
+        self.assertEqual(hash(uuid), hash(UUID(self.uuid_bytes)))
+        self.assertEqual(len({uuid, UUID(self.uuid_bytes)}), 1)
+        self.assertIn(uuid, {self.uuid_bytes})
+        self.assertEqual({Beacon.uuid_to_bin(self.uuid): 1}.get(uuid), 1)
+
+
 class AltBeaconTest(unittest.TestCase):
 
     uuid = "3df93d5a-a1f2-47bb-a3cf-3e49e6a89bb6"
@@ -50,10 +105,21 @@ class AltBeaconTest(unittest.TestCase):
         )
         self.assertEqual(beacon.adv_data, self.adv_data)
 
+    def test_encode_patch(self):
+        beacon = AltBeacon(uuid=self.uuid, major=self.major, minor=1)
+        adv_data = beacon.adv_data
+
+        beacon.company_id = self.company_id
+        beacon.minor = self.minor
+        beacon.reference_rssi = self.reference_rssi
+        beacon.mfg_reserved = self.mfg_reserved
+        self.assertIs(beacon.adv_data, adv_data)
+        self.assertEqual(adv_data, self.adv_data)
+
     def test_decode(self):
         beacon = AltBeacon(adv_data=self.adv_data)
         self.assertEqual(beacon.company_id, self.company_id)
-        self.assertEqual(beacon.uuid, self.uuid)
+        self.assertEqual(str(beacon.uuid), self.uuid)
         self.assertEqual(beacon.major, self.major)
         self.assertEqual(beacon.minor, self.minor)
         self.assertEqual(beacon.mfg_reserved, self.mfg_reserved)
@@ -78,9 +144,52 @@ class IBeaconTest(unittest.TestCase):
         )
         self.assertEqual(beacon.adv_data, self.adv_data)
 
+    def test_encode_cached(self):
+        beacon = IBeacon(uuid=self.uuid, major=self.major, minor=1)
+        adv_data = beacon.adv_data
+        self.assertIs(beacon.adv_data, adv_data)
+
+        beacon.minor = self.minor
+        beacon.reference_rssi = self.reference_rssi
+        self.assertIs(beacon.adv_data, adv_data)
+        self.assertEqual(adv_data, self.adv_data)
+
+        beacon.uuid = "3df93d5a-a1f2-47bb-a3cf-3e49e6a89bb6"
+        self.assertIs(beacon.adv_data, adv_data)
+        self.assertEqual(adv_data[9:25], AltBeaconTest.adv_data[9:25])
+
+        resp_bytes = beacon.resp_bytes
+        self.assertIs(beacon.resp_bytes, resp_bytes)
+        beacon.name = b"ubeacon 1337"
+        self.assertEqual(beacon.resp_bytes, b"\x02\x01\x06\x0d\x09ubeacon 1337")
+
+    def test_default_name(self):
+        Beacon._default_name = None
+        beacon = IBeacon(adv_data=self.adv_data)
+        self.assertIsNone(Beacon._default_name)
+        self.assertTrue(beacon.resp_bytes.endswith(beacon.name))
+        self.assertTrue(Beacon._default_name.startswith(b"ubeacon "))
+
     def test_decode(self):
         beacon = IBeacon(adv_data=self.adv_data)
-        self.assertEqual(beacon.uuid, self.uuid)
+        self.assertEqual(str(beacon.uuid), self.uuid)
+        self.assertEqual(beacon.major, self.major)
+        self.assertEqual(beacon.minor, self.minor)
+        self.assertEqual(beacon.reference_rssi, self.reference_rssi)
+        self.assertEqual(beacon.adv_data, self.adv_data)
+
+    def test_repr(self):
+        beacon = IBeacon(adv_data=self.adv_data)
+        self.assertEqual(
+            repr(beacon),
+            "IBeacon(uuid=UUID(acbdf5ff-d272-45f5-8e45-01672fe51c47), major=1337, "
+            "minor=21, reference_rssi=-65)",
+        )
+
+    def test_decode_memoryview(self):
+        adv_data = memoryview(bytearray(b"\x00\x00" + self.adv_data))
+        beacon = IBeacon(adv_data=adv_data, offset=2)
+        self.assertEqual(str(beacon.uuid), self.uuid)
         self.assertEqual(beacon.major, self.major)
         self.assertEqual(beacon.minor, self.minor)
         self.assertEqual(beacon.reference_rssi, self.reference_rssi)
@@ -105,7 +214,7 @@ class LinTechBeaconTest(unittest.TestCase):
 
     def test_decode(self):
         beacon = LinTechBeacon(adv_data=self.adv_data)
-        self.assertEqual(beacon.uuid, self.uuid)
+        self.assertEqual(str(beacon.uuid), self.uuid)
         self.assertEqual(beacon.major, self.major)
         self.assertEqual(beacon.minor, self.minor)
         self.assertEqual(beacon.reference_rssi, self.reference_rssi)
@@ -133,6 +242,13 @@ class EddystoneUidTest(unittest.TestCase):
         self.assertEqual(beacon.instance, self.instance)
         self.assertEqual(beacon.reference_rssi, self.reference_rssi)
 
+    def test_decode_memoryview(self):
+        adv_data = memoryview(bytearray(b"\x00" + self.adv_data))
+        beacon = EddystoneUID(adv_data=adv_data, offset=1)
+        self.assertEqual(beacon.namespace, self.namespace)
+        self.assertEqual(beacon.instance, self.instance)
+        self.assertEqual(beacon.reference_rssi, self.reference_rssi)
+
 
 class EddystoneUrlTest(unittest.TestCase):
 
@@ -163,6 +279,107 @@ class EddystoneUrlTest(unittest.TestCase):
             b"\x03\x03\xaa\xfe\x14\x16\xaa\xfe\x10\xbc\x03micropython.de",
         )
 
+    def test_encode_url_longest_match(self):
+        beacon = EddystoneURL(url="http://www.example.org/docs.info")
+        self.assertEqual(beacon.adv_data[9:], b"\xba\x00example\x01docs\x0b")
+
+    def test_url_round_trip(self):
+        for url in (
+            "https://www.micropython.org/",
+            "http://goo.gl/x.com/a.net",
+            "https://example.community/",
+            "http://a.gov.biz",
+        ):
+            beacon = EddystoneURL(url=url)
+            self.assertEqual(EddystoneURL(adv_data=beacon.adv_data).url, url)
+
+    def test_change_url(self):
+        beacon = EddystoneURL(url=self.url, reference_rssi=self.reference_rssi)
+        self.assertEqual(beacon.adv_data, self.adv_data)
+        beacon.url = b"https://micropython.de"
+        self.assertEqual(beacon.adv_data[4], 0x14)
+        beacon.url = b"https://micropython.com"
+        self.assertEqual(beacon.adv_data, self.adv_data)
+
+
+class EddystoneTlmTest(unittest.TestCase):
+
+    adv_data = b"\x03\x03\xaa\xfe\x11\x16\xaa\xfe\x20\x00\x0b\xb8\x18\x80\x00\x00\x01\x00\x00\x00\x0a\x00"
+    adv_data_etlm = (
+        b"\x03\x03\xaa\xfe\x15\x16\xaa\xfe\x20\x01"
+        + bytes(range(12))
+        + b"\x12\x34\xab\xcd"
+    )
+
+    def test_decode(self):
+        beacon = EddystoneTLM(adv_data=self.adv_data)
+        self.assertFalse(beacon.encrypted)
+        self.assertEqual(beacon.battery_voltage, 3000)
+        self.assertEqual(beacon.temperature, 24.5)
+        self.assertEqual(beacon.adv_count, 256)
+        self.assertEqual(beacon.sec_count, 2560)
+        self.assertIsNone(beacon.etlm)
+
+    def test_decode_no_temperature(self):
+        adv_data = self.adv_data[:12] + b"\x80\x00" + self.adv_data[14:]
+        self.assertIsNone(EddystoneTLM(adv_data=adv_data).temperature)
+
+    def test_decode_encrypted(self):
+        beacon = EddystoneTLM(adv_data=self.adv_data_etlm)
+        self.assertTrue(beacon.encrypted)
+        self.assertEqual(beacon.etlm, "000102030405060708090a0b")
+        self.assertEqual(beacon.salt, "1234")
+        self.assertEqual(beacon.mic, "abcd")
+        self.assertIsNone(beacon.battery_voltage)
+
+    def test_decode_invalid(self):
+        self.assertRaises(ValueError, EddystoneTLM, adv_data=self.adv_data[:-1])
+        adv_data = self.adv_data[:9] + b"\x02" + self.adv_data[10:]
+        self.assertRaises(ValueError, EddystoneTLM, adv_data=adv_data)
+
+    def test_classify(self):
+        self.assertIs(classify(self.adv_data), EddystoneTLM)
+        self.assertIs(classify(self.adv_data_etlm), EddystoneTLM)
+
+    def test_decode_many(self):
+        columns = EddystoneTLM.decode_many([self.adv_data, self.adv_data_etlm])
+        self.assertEqual(list(columns["version"]), [0, 1])
+        self.assertEqual(list(columns["battery_voltage"]), [3000, 0])
+        self.assertEqual(list(columns["has_battery_voltage"]), [1, 0])
+        self.assertEqual(list(columns["has_adv_count"]), [1, 0])
+
+
+class EddystoneEidTest(unittest.TestCase):
+
+    adv_data = (
+        b"\x03\x03\xaa\xfe\x0d\x16\xaa\xfe\x30\xbf\x01\x02\x03\x04\x05\x06\x07\x08"
+    )
+
+    def test_decode(self):
+        beacon = decode(self.adv_data)
+        self.assertIsInstance(beacon, EddystoneEID)
+        self.assertEqual(beacon.eid, "0102030405060708")
+        self.assertEqual(beacon.reference_rssi, -65)
+
+
+class EddystoneAggregatorTest(unittest.TestCase):
+    def test_update(self):
+        aggregator = EddystoneAggregator(maxsize=2)
+        addr = b"\x01" * 6
+        uid = decode(EddystoneUidTest.adv_data)
+        tlm = decode(EddystoneTlmTest.adv_data)
+        self.assertIsNone(aggregator.update(addr, decode(IBeaconTest.adv_data)))
+        aggregator.update(addr, uid)
+        device = aggregator.update(addr, tlm)
+        self.assertIs(device.uid, uid)
+        self.assertIs(device.tlm, tlm)
+        self.assertIs(aggregator.get(addr), device)
+
+        aggregator.update(b"\x02" * 6, tlm)
+        aggregator.update(b"\x03" * 6, tlm)
+        self.assertEqual(len(aggregator), 2)
+        self.assertIsNone(aggregator.get(addr))
+
 
 class RuuviTagTest(unittest.TestCase):
 
@@ -195,6 +412,56 @@ class RuuviTagTest(unittest.TestCase):
         self.assertEqual(beacon.acceleration_z, 714)
         self.assertEqual(beacon.battery_voltage, 2899)
 
+    def test_decode_raw(self):
+        # Negative acceleration_x, the payload contains bytes which look like
+        # a manufacturer specific ADV data structure
+        raw = self.adv_data_v5[7:14] + b"\xff\xfc" + self.adv_data_v5[16:]
+        beacon = RuuviTag(adv_data=raw)
+        self.assertEqual(beacon.data_format, 5)
+        self.assertEqual(beacon.acceleration_x, -4)
+        self.assertEqual(beacon.measurement_sequence, 205)
+
+        self.assertRaises(ValueError, RuuviTag, adv_data=b"\x04" + raw[1:])
+
+    def test_decode_buffer(self):
+        buffer = self.adv_data_v5[7:] + self.adv_data_v3 + self.adv_data_v5[7:]
+        columns = RuuviTag.decode_buffer(buffer)
+        self.assertEqual(list(columns["data_format"]), [5, 3, 5])
+        self.assertEqual(list(columns["pressure"]), [100044, 102766, 100044])
+        self.assertEqual(list(columns["acceleration_y"]), [-4, -1726, -4])
+        self.assertEqual(list(columns["battery_voltage"]), [2977, 2899, 2977])
+        self.assertEqual(list(columns["tx_power"]), [4, 0, 4])
+        self.assertEqual(list(columns["measurement_sequence"]), [205, 0, 205])
+        self.assertEqual(list(columns["has_tx_power"]), [1, 0, 1])
+        self.assertEqual(list(columns["has_measurement_sequence"]), [1, 0, 1])
+        self.assertAlmostEqual(columns["temperature"][0], 24.3, places=4)
+        self.assertAlmostEqual(columns["temperature"][1], 26.3, places=4)
+        self.assertAlmostEqual(columns["humidity"][1], 20.5, places=4)
+
+        self.assertRaises(ValueError, RuuviTag.decode_buffer, b"\x04")
+        self.assertRaises(ValueError, RuuviTag.decode_buffer, buffer[:-1])
+        self.assertRaises(ValueError, RuuviTag.decode_buffer, self.adv_data_v3[:5])
+
+    def test_decode_many(self):
+        columns = RuuviTag.decode_many([self.adv_data_v5, self.adv_data_v3])
+        self.assertEqual(list(columns["tx_power"]), [4, 0])
+        self.assertEqual(list(columns["has_tx_power"]), [1, 0])
+        self.assertEqual(list(columns["has_measurement_sequence"]), [1, 0])
+        self.assertNotIn("has_pressure", columns)
+
+    def test_decode_truncated(self):
+        self.assertRaises(ValueError, RuuviTag, adv_data=self.adv_data_v5[:12])
+        self.assertRaises(ValueError, RuuviTag, adv_data=self.adv_data_v3[:-1])
+        self.assertIsNone(decode(self.adv_data_v5[:12]))
+        columns = RuuviTag.decode_many([self.adv_data_v5[:12]], skip_invalid=True)
+        self.assertEqual(len(columns["pressure"]), 0)
+
+    def test_decode_memoryview(self):
+        beacon = RuuviTag(adv_data=memoryview(self.adv_data_v5))
+        self.assertEqual(beacon.data_format, 5)
+        self.assertEqual(beacon.pressure, 100044)
+        self.assertEqual(beacon.measurement_sequence, 205)
+
 
 class MikroTikBeaconTest(unittest.TestCase):
 
@@ -212,5 +479,720 @@ class MikroTikBeaconTest(unittest.TestCase):
         self.assertEqual(beacon.battery, 95)
 
 
+class DecodeTest(unittest.TestCase):
+    def test_decode(self):
+        for beacon_class, adv_data in (
+            (IBeacon, IBeaconTest.adv_data),
+            (AltBeacon, AltBeaconTest.adv_data),
+            (LinTechBeacon, LinTechBeaconTest.adv_data),
+            (EddystoneUID, EddystoneUidTest.adv_data),
+            (EddystoneURL, EddystoneUrlTest.adv_data),
+            (RuuviTag, RuuviTagTest.adv_data_v5),
+            (MikroTik, MikroTikBeaconTest.adv_data),
+        ):
+            self.assertIs(classify(adv_data), beacon_class)
+            self.assertIsInstance(decode(adv_data), beacon_class)
+
+    def test_decode_unknown(self):
+        self.assertIsNone(decode(b"\x02\x01\x06\x05\xff\x59\x00\x01\x02"))
+        self.assertIsNone(decode(b"\x02\x01\x06\x03\x03\xaa\xfe"))
+        self.assertIsNone(decode(b""))
+
+    def test_decode_invalid(self):
+        self.assertIsNone(decode(IBeaconTest.adv_data[:-1]))
+        self.assertIsNone(classify(IBeaconTest.adv_data[:-1]))
+        self.assertIsNone(classify(IBeaconTest.adv_data[:8]))
+
+    def test_decode_extra_structures(self):
+        tx_power = b"\x02\x0a\xc5"
+        name = b"\x05\x09test"
+        adv_data = tx_power + IBeaconTest.adv_data[3:] + name
+        beacon = decode(adv_data)
+        self.assertIsInstance(beacon, IBeacon)
+        self.assertEqual(beacon.major, IBeaconTest.major)
+        self.assertEqual(IBeacon(adv_data=adv_data).minor, IBeaconTest.minor)
+
+        adv_data = EddystoneUidTest.adv_data[:4] + name + EddystoneUidTest.adv_data[4:]
+        beacon = decode(adv_data)
+        self.assertIsInstance(beacon, EddystoneUID)
+        self.assertEqual(beacon.instance, EddystoneUidTest.instance)
+
+    def test_decode_truncated_trailer(self):
+        # A truncated structure after the beacon data doesn't invalidate it
+        tx_power = b"\x02\x0a\xc5"
+        adv_data = IBeaconTest.adv_data[:3] + tx_power + IBeaconTest.adv_data[3:]
+        adv_data += b"\x05\x09te"
+        self.assertEqual(decode(adv_data).major, IBeaconTest.major)
+        self.assertEqual(AdvPayload(adv_data).decode(IBeacon).major, IBeaconTest.major)
+        self.assertEqual(IBeacon(adv_data=adv_data).major, IBeaconTest.major)
+        self.assertEqual(IBeacon(adv_data=adv_data, offset=6).minor, IBeaconTest.minor)
+
+
+class AdvPayloadTest(unittest.TestCase):
+    adv_data = b"\x02\x01\x06\x02\x0a\xc5" + IBeaconTest.adv_data[3:] + b"\x05\x09test"
+
+    def test_index(self):
+        payload = AdvPayload(self.adv_data)
+        self.assertIn(0x0A, payload)
+        self.assertNotIn(0x16, payload)
+        self.assertEqual(payload.offset(0xFF), 6)
+        self.assertEqual(payload.offset(0x16), -1)
+        self.assertEqual(bytes(payload.get(0x09)), b"test")
+        self.assertEqual(bytes(payload.get(0x0A)), b"\xc5")
+        self.assertIsNone(payload.get(0x16))
+
+    def test_truncated(self):
+        payload = AdvPayload(self.adv_data[:-2])
+        self.assertIn(0xFF, payload)
+        self.assertNotIn(0x09, payload)
+
+    def test_decode(self):
+        payload = AdvPayload(self.adv_data)
+        self.assertEqual(payload.decode(IBeacon).major, IBeaconTest.major)
+        self.assertIsNone(payload.decode(EddystoneUID))
+
+
+class DecodeBatchTest(unittest.TestCase):
+    def test_decode_many(self):
+        other = IBeacon(uuid=IBeaconTest.uuid, major=1, minor=2).adv_data
+        columns = IBeacon.decode_many([IBeaconTest.adv_data, other])
+        self.assertEqual(list(map(str, columns["uuid"])), [IBeaconTest.uuid])
+        self.assertEqual(list(columns["uuid_index"]), [0, 0])
+        self.assertEqual(list(columns["major"]), [IBeaconTest.major, 1])
+        self.assertEqual(list(columns["minor"]), [IBeaconTest.minor, 2])
+        self.assertEqual(list(columns["reference_rssi"]), [-65, -70])
+
+    def test_decode_many_invalid(self):
+        payloads = [IBeaconTest.adv_data[:-1]]
+        self.assertRaises(ValueError, IBeacon.decode_many, payloads)
+        columns = IBeacon.decode_many(payloads, skip_invalid=True)
+        self.assertEqual(len(columns["major"]), 0)
+
+    def test_decode_batch(self):
+        columns = decode_batch(
+            [
+                IBeaconTest.adv_data,
+                RuuviTagTest.adv_data_v5,
+                MikroTikBeaconTest.adv_data,
+                IBeaconTest.adv_data,
+                b"\x02\x01\x06",
+            ]
+        )
+        self.assertEqual(len(columns), 3)
+        self.assertEqual(list(columns[IBeacon]["minor"]), [21, 21])
+        self.assertEqual(list(columns[RuuviTag]["pressure"]), [100044])
+        self.assertEqual(list(columns[MikroTik]["battery"]), [95])
+
+
+class BeaconFilterTest(unittest.TestCase):
+    def test_match(self):
+        beacon = IBeacon(adv_data=IBeaconTest.adv_data)
+        self.assertTrue(BeaconFilter(uuid=IBeaconTest.uuid, major=1337).match(beacon))
+        self.assertTrue(
+            BeaconFilter(major=[1, 1337], minor=range(10, 30)).match(beacon)
+        )
+        self.assertFalse(BeaconFilter(major=1336).match(beacon))
+        beacon = IBeacon(uuid=IBeaconTest.uuid, major=1, minor=2)
+        self.assertTrue(BeaconFilter(uuid=[IBeaconTest.uuid]).match(beacon))
+        self.assertFalse(BeaconFilter(uuid=AltBeaconTest.uuid).match(beacon))
+        self.assertFalse(BeaconFilter(minor=range(22, 30)).match(beacon))
+
+    def test_match_namespace_prefix(self):
+        beacon = EddystoneUID(adv_data=EddystoneUidTest.adv_data)
+        self.assertTrue(BeaconFilter(namespace_prefix="85b9ae").match(beacon))
+        self.assertFalse(BeaconFilter(namespace_prefix="85b9af").match(beacon))
+        self.assertTrue(BeaconFilter(namespace_prefix="85B9AE").match(beacon))
+        beacon_filter = BeaconFilter(namespace=EddystoneUidTest.namespace.upper())
+        self.assertTrue(beacon_filter.match(beacon))
+
+    def test_pattern(self):
+        pattern = BeaconFilter(uuid=IBeaconTest.uuid, major=1337).pattern(IBeacon)
+        self.assertTrue(pattern.complete)
+        self.assertTrue(pattern.match(IBeaconTest.adv_data))
+        self.assertTrue(pattern.match(IBeaconTest.adv_data[3:]))
+        self.assertFalse(pattern.match(IBeaconTest.adv_data[:20]))
+        self.assertFalse(pattern.match(LinTechBeaconTest.adv_data))
+        tx_power = b"\x02\x0a\xc5"
+        self.assertTrue(pattern.match(tx_power + IBeaconTest.adv_data))
+        self.assertTrue(pattern.match(IBeaconTest.adv_data + b"\x05\x09test"))
+        pattern = BeaconFilter(major=1336).pattern(IBeacon)
+        self.assertFalse(pattern.match(tx_power + IBeaconTest.adv_data))
+        self.assertFalse(
+            BeaconFilter(major=1336).pattern(IBeacon).match(IBeaconTest.adv_data)
+        )
+
+    def test_pattern_range(self):
+        pattern = BeaconFilter(major=range(0x0500, 0x0600)).pattern(IBeacon)
+        self.assertTrue(pattern.complete)
+        self.assertTrue(pattern.match(IBeaconTest.adv_data))
+        pattern = BeaconFilter(major=range(0x0600, 0x0700)).pattern(IBeacon)
+        self.assertFalse(pattern.match(IBeaconTest.adv_data))
+
+        pattern = BeaconFilter(major=range(1000, 2000), minor=[1, 2]).pattern(IBeacon)
+        self.assertFalse(pattern.complete)
+        self.assertTrue(pattern.match(IBeaconTest.adv_data))
+
+    def test_pattern_eddystone(self):
+        beacon_filter = BeaconFilter(namespace_prefix="85b9ae", instance="000000001337")
+        pattern = beacon_filter.pattern(EddystoneUID)
+        self.assertTrue(pattern.match(EddystoneUidTest.adv_data))
+        self.assertTrue(pattern.match(b"\x02\x01\x06" + EddystoneUidTest.adv_data))
+        self.assertFalse(pattern.match(IBeaconTest.adv_data))
+        self.assertRaises(ValueError, beacon_filter.pattern, IBeacon)
+
+        pattern = BeaconFilter(namespace_prefix="85b").pattern(EddystoneUID)
+        self.assertTrue(pattern.match(EddystoneUidTest.adv_data))
+        pattern = BeaconFilter(namespace_prefix="85c").pattern(EddystoneUID)
+        self.assertFalse(pattern.match(EddystoneUidTest.adv_data))
+
+
+class FilterIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = FilterIndex()
+        self.index.add("ibeacon", BeaconFilter(uuid=IBeaconTest.uuid))
+        self.index.add(
+            "range",
+            BeaconFilter(
+                uuid=[IBeaconTest.uuid, AltBeaconTest.uuid], major=range(1000, 2000)
+            ),
+        )
+        self.index.add("minor", BeaconFilter(minor=42))
+        self.index.add("namespace", BeaconFilter(namespace_prefix="85b9ae95"))
+        self.index.add(
+            "instance",
+            BeaconFilter(namespace=EddystoneUidTest.namespace, instance="000000000001"),
+        )
+
+    def test_match(self):
+        beacon = IBeacon(adv_data=IBeaconTest.adv_data)
+        self.assertEqual(sorted(self.index.match(beacon)), ["ibeacon", "range"])
+        beacon = AltBeacon(adv_data=AltBeaconTest.adv_data)
+        self.assertEqual(self.index.match(beacon), ["minor"])
+        beacon = EddystoneUID(adv_data=EddystoneUidTest.adv_data)
+        self.assertEqual(self.index.match(beacon), ["namespace"])
+
+    def test_match_namespace(self):
+        index = FilterIndex()
+        namespace = EddystoneUidTest.namespace
+        index.add("both", BeaconFilter(namespace=namespace, namespace_prefix="85b9"))
+        index.add("other", BeaconFilter(namespace=namespace, namespace_prefix="85c"))
+        index.add("nibble", BeaconFilter(namespace_prefix="85B"))
+        beacon = EddystoneUID(adv_data=EddystoneUidTest.adv_data)
+        self.assertEqual(sorted(index.match(beacon)), ["both", "nibble"])
+        self.assertEqual(
+            sorted(index.match_adv(EddystoneUidTest.adv_data)), ["both", "nibble"]
+        )
+        beacon = EddystoneUID(namespace="85c9ae954b59c3d6f69d", instance="000000001337")
+        self.assertEqual(index.match(beacon), [])
+        beacon = EddystoneUID(namespace="85B9AE954B59C3D6F69D", instance="000000001337")
+        self.assertEqual(sorted(index.match(beacon)), ["both", "nibble"])
+        self.assertEqual(sorted(index.match_adv(beacon.adv_data)), ["both", "nibble"])
+        beacon_filter = BeaconFilter(namespace_prefix="8g")
+        self.assertRaises(ValueError, index.add, "invalid", beacon_filter)
+
+    def test_match_adv(self):
+        self.assertEqual(
+            sorted(self.index.match_adv(IBeaconTest.adv_data)), ["ibeacon", "range"]
+        )
+        self.assertEqual(self.index.match_adv(AltBeaconTest.adv_data), ["minor"])
+        self.assertEqual(self.index.match_adv(LinTechBeaconTest.adv_data), ["minor"])
+        self.assertEqual(self.index.match_adv(EddystoneUidTest.adv_data), ["namespace"])
+        self.assertEqual(self.index.match_adv(MikroTikBeaconTest.adv_data), [])
+        self.assertEqual(self.index.match_adv(IBeaconTest.adv_data[:20]), [])
+
+
+class SightingCacheTest(unittest.TestCase):
+    addr = b"\x01\x02\x03\x04\x05\x06"
+
+    def test_decode(self):
+        cache = SightingCache(ttl_ms=1000)
+        beacon = cache.decode(self.addr, IBeaconTest.adv_data, now=0)
+        self.assertIsInstance(beacon, IBeacon)
+        self.assertIs(cache.decode(self.addr, IBeaconTest.adv_data, now=500), beacon)
+        self.assertIsNot(
+            cache.decode(self.addr, IBeaconTest.adv_data, now=1500), beacon
+        )
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+        beacon = cache.decode(self.addr, AltBeaconTest.adv_data, now=1600)
+        self.assertIsInstance(beacon, AltBeacon)
+        self.assertIsNone(cache.decode(b"\x00" * 6, b"\x02\x01\x06", now=1600))
+
+    def test_suppress(self):
+        cache = SightingCache(ttl_ms=1000, suppress=True)
+        self.assertIsNotNone(cache.decode(self.addr, IBeaconTest.adv_data, now=0))
+        self.assertIsNone(cache.decode(self.addr, IBeaconTest.adv_data, now=999))
+        self.assertIsNotNone(cache.decode(self.addr, AltBeaconTest.adv_data, now=999))
+        self.assertIsNotNone(cache.decode(self.addr, AltBeaconTest.adv_data, now=2000))
+
+    def test_interleaved(self):
+        cache = SightingCache(ttl_ms=1000, suppress=True)
+        frames = [EddystoneUidTest.adv_data, EddystoneTlmTest.adv_data] * 5
+        emitted = [cache.decode(self.addr, adv_data, now=0) for adv_data in frames]
+        self.assertIsInstance(emitted[0], EddystoneUID)
+        self.assertIsInstance(emitted[1], EddystoneTLM)
+        self.assertEqual(emitted[2:], [None] * 8)
+        self.assertEqual((cache.hits, cache.misses), (8, 2))
+
+    def test_evict(self):
+        cache = SightingCache(maxsize=2)
+        cache.decode(b"\x01" * 6, IBeaconTest.adv_data, now=0)
+        cache.decode(b"\x02" * 6, IBeaconTest.adv_data, now=0)
+        cache.decode(b"\x01" * 6, IBeaconTest.adv_data, now=0)
+        cache.decode(b"\x03" * 6, IBeaconTest.adv_data, now=0)
+        self.assertEqual(len(cache), 2)
+        cache.decode(b"\x01" * 6, IBeaconTest.adv_data, now=0)
+        self.assertEqual((cache.hits, cache.misses), (2, 3))
+
+
+class BeaconTrackerTest(unittest.TestCase):
+    def test_update(self):
+        tracker = BeaconTracker(capacity=2, timeout_ms=1000, alpha=0.5)
+        beacon = IBeacon(adv_data=IBeaconTest.adv_data)
+
+        self.assertEqual(tracker.update("a", beacon, -65, now=0), EVENT_ENTER)
+        self.assertAlmostEqual(tracker.distance("a"), 1.0)
+        self.assertEqual(tracker.update("a", beacon, -85, now=100), EVENT_UPDATE)
+        self.assertAlmostEqual(tracker.rssi("a"), -75)
+        self.assertAlmostEqual(tracker.distance("a"), 10**0.5, places=4)
+        self.assertEqual(tracker.last_seen("a"), 100)
+
+        self.assertEqual(tracker.update("b", beacon, -65, now=500), EVENT_ENTER)
+        self.assertIsNone(tracker.update("c", beacon, -65, now=500))
+        self.assertEqual(tracker.dropped, 1)
+
+    def test_expire(self):
+        tracker = BeaconTracker(capacity=2, timeout_ms=1000)
+        beacon = EddystoneUID(adv_data=EddystoneUidTest.adv_data)
+        tracker.update("a", beacon, -65, now=0)
+        tracker.update("b", beacon, -65, now=500)
+
+        self.assertEqual(tracker.expire(now=1000), [(EVENT_EXIT, "a", beacon)])
+        self.assertNotIn("a", tracker)
+        self.assertEqual(len(tracker), 1)
+        self.assertEqual(tracker.update("c", beacon, -65, now=1000), EVENT_ENTER)
+
+
+class PipelineTest(unittest.TestCase):
+    def sightings(self):
+        return [
+            Sighting(b"\x01" * 6, -60, IBeaconTest.adv_data),
+            Sighting(b"\x02" * 6, -60, b"\x02\x01\x06"),
+            Sighting(b"\x03" * 6, -60, AltBeaconTest.adv_data),
+            Sighting(b"\x01" * 6, -60, IBeaconTest.adv_data),
+        ]
+
+    def test_pipeline(self):
+        consumed = []
+        sightings = pipeline(
+            self.sightings(),
+            decoded(SightingCache(suppress=True)),
+            matching(BeaconFilter(major=[17, 1337])),
+            fanout(consumed.append, consumed.append),
+        )
+        beacons = [sighting.beacon for sighting in sightings]
+        self.assertEqual(len(beacons), 2)
+        self.assertIsInstance(beacons[0], IBeacon)
+        self.assertIsInstance(beacons[1], AltBeacon)
+        self.assertEqual(len(consumed), 4)
+
+    def test_matching_adv(self):
+        pattern = BeaconFilter(major=17).pattern(AltBeacon)
+        sightings = list(pipeline(self.sightings(), matching_adv(pattern), decoded()))
+        self.assertEqual(len(sightings), 1)
+        self.assertEqual(sightings[0].beacon.major, 17)
+
+    def test_async_pipeline(self):
+        class Scanner:
+            def __init__(self, items):
+                self._items = iter(items)
+
+            def __aiter__(self):
+                return self
+
+            async def __anext__(self):
+                try:
+                    return next(self._items)
+                except StopIteration:
+                    raise StopAsyncIteration
+
+        async def consume():
+            return [
+                sighting.beacon
+                async for sighting in AsyncPipeline(
+                    Scanner(self.sightings()), decoded()
+                )
+            ]
+
+        self.assertEqual(len(asyncio.run(consume())), 3)
+
+
+class ScannerServiceTest(unittest.TestCase):
+    def test_backpressure(self):
+        service = ScannerService(None, maxsize=2)
+        service.put(b"\x01" * 6, -60, IBeaconTest.adv_data)
+        service.put(b"\x02" * 6, -60, AltBeaconTest.adv_data)
+        service.put(b"\x01" * 6, -50, IBeaconTest.adv_data)
+        service.put(b"\x03" * 6, -60, AltBeaconTest.adv_data)
+        self.assertEqual(len(service), 2)
+        self.assertEqual(service.received, 4)
+        self.assertEqual(service.coalesced, 1)
+        self.assertEqual(service.dropped, 1)
+        self.assertEqual(list(service._queue), [b"\x01" * 6, b"\x03" * 6])
+
+    class Scanner:
+        """Async iterator of scan results like aioble.scan"""
+
+        class Result:
+            def __init__(self, sighting):
+                self.device = ScannerServiceTest.Device(sighting.addr)
+                self.rssi = sighting.rssi
+                self.adv_data = sighting.adv_data
+
+        def __init__(self, items):
+            self._items = iter(items)
+
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            await asyncio.sleep(0)
+            try:
+                return self.Result(next(self._items))
+            except StopIteration:
+                raise StopAsyncIteration
+
+    class Device:
+        def __init__(self, addr):
+            self.addr = addr
+
+    def test_run(self):
+        consumed = []
+
+        async def consumer(sighting):
+            consumed.append(sighting.beacon)
+
+        service = ScannerService(consumer, decoded())
+        scanner = self.Scanner(
+            [
+                Sighting(b"\x01" * 6, -60, IBeaconTest.adv_data),
+                Sighting(b"\x02" * 6, -60, b"\x02\x01\x06"),
+                Sighting(b"\x03" * 6, -60, AltBeaconTest.adv_data),
+                Sighting(b"\x04" * 6, -60, IBeaconTest.adv_data),
+            ]
+        )
+        asyncio.run(service.run(scanner))
+        self.assertEqual(service.received, 4)
+        self.assertEqual(service.processed, 3)
+        self.assertEqual(len(consumed), 3)
+        self.assertIsInstance(consumed[0], IBeacon)
+
+    def test_consumer_error(self):
+        consumed = []
+
+        async def consumer(sighting):
+            consumed.append(sighting)
+            if len(consumed) == 1:
+                raise RuntimeError("consumer failed")
+
+        service = ScannerService(consumer, decoded(), maxsize=4)
+        scanner = self.Scanner(
+            Sighting(bytes([i]) * 6, -60, IBeaconTest.adv_data) for i in range(200)
+        )
+        asyncio.run(service.run(scanner))
+        self.assertEqual(service.failed, 1)
+        self.assertIsInstance(service.last_error, RuntimeError)
+        self.assertEqual(service.processed, len(consumed))
+        self.assertEqual(service.processed + service.dropped, 200)
+
+
+class ReplayTest(unittest.TestCase):
+    payloads = [
+        IBeaconTest.adv_data,
+        AltBeaconTest.adv_data,
+        b"\x02\x01\x06",
+        IBeaconTest.adv_data,
+        EddystoneUidTest.adv_data,
+    ]
+
+    def test_merge(self):
+        total = {}
+        for adv_data in self.payloads:
+            merge(total, decode_batch([adv_data]))
+        self.assertEqual(list(total[IBeacon]["major"]), [1337, 1337])
+        self.assertEqual(len(total[IBeacon]["uuid"]), 1)
+        self.assertEqual(list(total[IBeacon]["uuid_index"]), [0, 0])
+
+    def test_optional_fields(self):
+        total = {}
+        merge(total, decode_batch([RuuviTagTest.adv_data_v5]))
+        merge(total, decode_batch([RuuviTagTest.adv_data_v5[:7] + b"\x03" * 24]))
+        self.assertEqual(list(total[RuuviTag]["has_tx_power"]), [1, 0])
+        self.assertEqual(to_json(total)["RuuviTag"]["tx_power"], [4, None])
+
+    def test_replay(self):
+        total = replay(self.payloads * 10, workers=2, chunksize=4)
+        self.assertEqual(len(total[IBeacon]["major"]), 20)
+        self.assertEqual(len(total[AltBeacon]["major"]), 10)
+        self.assertEqual(len(total[EddystoneUID]["namespace_index"]), 10)
+
+    def test_read_binary(self):
+        import tempfile
+
+        with tempfile.NamedTemporaryFile() as f:
+            for adv_data in self.payloads:
+                f.write(bytes([len(adv_data)]) + bytes(adv_data))
+            f.flush()
+            payloads = list(read_binary(f.name))
+        self.assertEqual(payloads, [bytes(adv_data) for adv_data in self.payloads])
+
+    def test_replay_capture(self):
+        import tempfile
+
+        with tempfile.NamedTemporaryFile() as f:
+            writer = CaptureWriter(f)
+            for adv_data in self.payloads * 10:
+                writer.write(b"\x01" * 6, -60, adv_data)
+            f.flush()
+            total = replay_capture(f.name, workers=2, chunksize=4)
+        self.assertEqual(len(total[IBeacon]["major"]), 20)
+        self.assertEqual(len(total[EddystoneUID]["namespace_index"]), 10)
+
+
+class CaptureTest(unittest.TestCase):
+    def test_records(self):
+        import io
+
+        f = io.BytesIO()
+        writer = CaptureWriter(f)
+        writer.write(b"\x01" * 6, -60, IBeaconTest.adv_data, 1000)
+        writer.write(b"\x02" * 6, -70, AltBeaconTest.adv_data)
+        buffer = f.getvalue()
+        check_header(buffer)
+        (timestamp_ms, addr, rssi, adv_data), record = records(buffer)
+        self.assertEqual(timestamp_ms, 1000)
+        self.assertEqual(addr, b"\x01" * 6)
+        self.assertEqual(rssi, -60)
+        self.assertIsInstance(adv_data, memoryview)
+        self.assertEqual(decode(adv_data).major, 1337)
+        self.assertEqual(record[2], -70)
+        self.assertEqual(bytes(record[3]), AltBeaconTest.adv_data)
+
+    def test_truncated(self):
+        import io
+        import tempfile
+
+        f = io.BytesIO()
+        writer = CaptureWriter(f)
+        writer.write(b"\x01" * 6, -60, IBeaconTest.adv_data, 1000)
+        writer.write(b"\x02" * 6, -70, AltBeaconTest.adv_data, 1000)
+        buffer = f.getvalue()
+        for size in (len(buffer) - 20, len(buffer) - 40):
+            iterator = records(buffer[:size])
+            self.assertEqual(bytes(next(iterator)[3]), IBeaconTest.adv_data)
+            self.assertRaises(ValueError, next, iterator)
+
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(buffer[:-20])
+            f.flush()
+            with CaptureReader(f.name) as capture:
+                self.assertRaises(ValueError, list, capture.ranges(1))
+
+    def test_check_header(self):
+        self.assertRaises(ValueError, check_header, b"")
+        self.assertRaises(ValueError, check_header, b"\x02\x01\x06\x1a\xffL\x00\x02")
+
+    def test_reader(self):
+        import tempfile
+
+        with tempfile.NamedTemporaryFile() as f:
+            writer = CaptureWriter(f)
+            for adv_data in ReplayTest.payloads:
+                writer.write(b"\x01" * 6, -60, adv_data)
+            f.flush()
+            with CaptureReader(f.name) as capture:
+                payloads = [bytes(record[3]) for record in capture]
+                ranges = list(capture.ranges(2))
+        self.assertEqual(
+            payloads, [bytes(adv_data) for adv_data in ReplayTest.payloads]
+        )
+        self.assertEqual(len(ranges), 3)
+        self.assertEqual(ranges[0][0], 8)
+
+
+class DecodeStatsTest(unittest.TestCase):
+    def tearDown(self):
+        instrument(None)
+
+    def test_decode(self):
+        stats = DecodeStats()
+        instrument(stats)
+        decode(IBeaconTest.adv_data)
+        adv_data = IBeaconTest.adv_data
+        decode(adv_data[:3] + b"\x19" + adv_data[4:-1])
+        decode(EddystoneUidTest.adv_data)
+        decode(b"\x02\x01\x06")
+        decode_batch([AltBeaconTest.adv_data, AltBeaconTest.adv_data])
+        self.assertEqual(stats.packets[IBeacon], 2)
+        self.assertEqual(stats.packets[None], 1)
+        self.assertEqual(stats.packets[AltBeacon], 2)
+        self.assertEqual(stats.decoded[IBeacon], 1)
+        self.assertEqual(stats.decoded[EddystoneUID], 1)
+        self.assertEqual(stats.decoded[AltBeacon], 2)
+        self.assertEqual(stats.failures[(IBeacon, "Invalid size")], 1)
+        self.assertIn("IBeacon: 1 failed: Invalid size", stats.summary())
+
+    def test_disabled(self):
+        stats = DecodeStats()
+        instrument(stats)
+        instrument(None)
+        decode(IBeaconTest.adv_data)
+        self.assertEqual(stats.packets, {})
+
+
+class ScanAssemblerTest(unittest.TestCase):
+    name = b"\x05\x09test"
+
+    def test_merge(self):
+        assembler = ScanAssembler()
+        addr = b"\x01" * 6
+        self.assertIsNone(assembler.add(addr, ADV_IND, b"\x02\x01\x06", 0))
+        adv_data = assembler.add(addr, SCAN_RSP, IBeaconTest.adv_data[3:], 10)
+        self.assertEqual(adv_data, IBeaconTest.adv_data)
+        self.assertEqual(decode(adv_data).major, IBeaconTest.major)
+        self.assertEqual(assembler.merged, 1)
+        self.assertEqual(len(assembler), 0)
+
+    def test_not_scannable(self):
+        assembler = ScanAssembler()
+        adv_data = assembler.add(b"\x01" * 6, ADV_NONCONN_IND, IBeaconTest.adv_data)
+        self.assertEqual(adv_data, IBeaconTest.adv_data)
+        self.assertEqual(assembler.add(b"\x02" * 6, SCAN_RSP, self.name), self.name)
+
+    def test_expire(self):
+        assembler = ScanAssembler(timeout_ms=100)
+        assembler.add(b"\x01" * 6, ADV_IND, IBeaconTest.adv_data, 0)
+        assembler.add(b"\x02" * 6, ADV_IND, AltBeaconTest.adv_data, 50)
+        self.assertEqual(assembler.expire(99), [])
+        self.assertEqual(assembler.expire(100), [(b"\x01" * 6, IBeaconTest.adv_data)])
+        self.assertEqual(len(assembler), 1)
+
+    def test_evict(self):
+        assembler = ScanAssembler(maxsize=2)
+        assembler.add(b"\x01" * 6, ADV_IND, IBeaconTest.adv_data, 0)
+        assembler.add(b"\x02" * 6, ADV_IND, IBeaconTest.adv_data, 0)
+        assembler.add(b"\x01" * 6, ADV_IND, IBeaconTest.adv_data, 0)
+        assembler.add(b"\x03" * 6, ADV_IND, IBeaconTest.adv_data, 0)
+        self.assertEqual(assembler.evicted, 1)
+        self.assertEqual(assembler.add(b"\x02" * 6, SCAN_RSP, self.name), self.name)
+        self.assertEqual(len(assembler), 2)
+        self.assertEqual(assembler.expire(0), [(b"\x02" * 6, IBeaconTest.adv_data)])
+        self.assertEqual(assembler.expire(0), [])
+
+    def test_no_scan_response(self):
+        assembler = ScanAssembler(timeout_ms=1000)
+        addr = b"\x01" * 6
+        decoded = []
+        for i in range(50):
+            adv_data = IBeaconTest.adv_data[:-1] + bytes([i])
+            previous = assembler.add(addr, ADV_IND, adv_data, i * 100)
+            if previous is not None:
+                decoded.append(previous[-1])
+            for _, expired in assembler.expire(i * 100):
+                decoded.append(expired[-1])
+        self.assertEqual(decoded, list(range(49)))
+        self.assertEqual(assembler.expire(5900), [(addr, adv_data)])
+
+
+class AdvertiserTest(unittest.TestCase):
+    def beacons(self):
+        return (
+            IBeacon(uuid=IBeaconTest.uuid, major=1, minor=1),
+            EddystoneUID(
+                namespace=EddystoneUidTest.namespace,
+                instance=EddystoneUidTest.instance,
+            ),
+            EddystoneURL(url=EddystoneUrlTest.url),
+        )
+
+    def test_schedule(self):
+        ibeacon, uid, url = self.beacons()
+        advertiser = Advertiser()
+        advertiser.add(ibeacon, weight=2)
+        advertiser.add(uid)
+        advertiser.add(url)
+        rotation = [advertiser.next() for _ in range(8)]
+        self.assertEqual(rotation, [ibeacon, uid, url, ibeacon] * 2)
+
+        advertiser.remove(ibeacon)
+        self.assertEqual([advertiser.next() for _ in range(3)], [uid, url, uid])
+
+    def test_empty(self):
+        advertiser = Advertiser()
+        self.assertRaises(ValueError, advertiser.next)
+        self.assertRaises(ValueError, advertiser.add, self.beacons()[0], 0)
+
+    def test_run(self):
+        advertised = []
+        ibeacon, uid, url = self.beacons()
+        advertiser = Advertiser(
+            lambda interval_us, adv_data, resp_data: advertised.append(adv_data),
+            slot_ms=1,
+        )
+        advertiser.add(ibeacon)
+        advertiser.add(url)
+        asyncio.run(advertiser.run(slots=3))
+        self.assertEqual(len(advertised), 3)
+        self.assertIs(advertised[0], ibeacon.adv_data)
+        self.assertIs(advertised[1], url.adv_data)
+
+
+class EncodeManyTest(unittest.TestCase):
+    def test_ibeacon(self):
+        template = IBeacon(uuid=IBeaconTest.uuid, major=1, minor=1)
+        buffer = template.encode_many(major=range(1, 4), minor=[7, 8, 9])
+        self.assertEqual(len(buffer), 3 * len(template.adv_data))
+        for i in range(3):
+            beacon = IBeacon(uuid=IBeaconTest.uuid, major=i + 1, minor=i + 7)
+            self.assertEqual(buffer[i * 30 : (i + 1) * 30], beacon.adv_data)
+
+    def test_uuid(self):
+        template = AltBeacon(uuid=AltBeaconTest.uuid, major=1, minor=1)
+        uuid = UUID(Beacon.uuid_to_bin(IBeaconTest.uuid))
+        buffer = template.encode_many(uuid=[IBeaconTest.uuid, uuid])
+        for i in range(2):
+            beacon = decode(bytes(buffer[i * 31 : (i + 1) * 31]))
+            self.assertEqual(str(beacon.uuid), IBeaconTest.uuid)
+            self.assertEqual(beacon.major, 1)
+
+    def test_eddystone(self):
+        template = EddystoneUID(
+            namespace=EddystoneUidTest.namespace,
+            instance="000000000000",
+            reference_rssi=EddystoneUidTest.reference_rssi,
+        )
+        buffer = template.encode_many(instance=[EddystoneUidTest.instance])
+        self.assertEqual(buffer, EddystoneUidTest.adv_data)
+
+    def test_int_instance(self):
+        template = EddystoneUID(
+            namespace=EddystoneUidTest.namespace,
+            instance="000000000000",
+            reference_rssi=EddystoneUidTest.reference_rssi,
+        )
+        buffer = template.encode_many(instance=range(255, 258))
+        size = len(template.adv_data)
+        instances = [
+            decode(bytes(buffer[i * size : (i + 1) * size])).instance for i in range(3)
+        ]
+        self.assertEqual(instances, ["0000000000ff", "000000000100", "000000000101"])
+
+    def test_invalid(self):
+        template = IBeacon(uuid=IBeaconTest.uuid, major=1, minor=1)
+        self.assertRaises(ValueError, template.encode_many, namespace=["00"])
+        self.assertRaises(ValueError, template.encode_many, major=[1], minor=[1, 2])
+        self.assertEqual(template.encode_many(), template.adv_data)
+
+
 if __name__ == "__main__":
     unittest.main()
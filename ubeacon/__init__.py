@@ -1,7 +1,34 @@
 import sys
 
+from array import array
+from struct import pack_into
 from binascii import hexlify, unhexlify
 
+try:
+    from micropython import const
+except ImportError:  # CPython
+
+    def const(value):
+        return value
+
+
+try:
+    from time import ticks_add, ticks_diff, ticks_ms, ticks_us
+except ImportError:  # CPython
+    from time import monotonic
+
+    def ticks_add(ticks, delta):
+        return ticks + delta
+
+    def ticks_ms():
+        return int(monotonic() * 1000)
+
+    def ticks_us():
+        return int(monotonic() * 1_000_000)
+
+    def ticks_diff(ticks1, ticks2):
+        return ticks1 - ticks2
+
 
 # Constants for the advertising data flags
 FLAGS_DATA = const(0x06)  # Discoverable, without BR/EDR support
@@ -11,9 +38,47 @@ FLAGS_LENGTH = const(0x02)
 # ADV data frame type for the manufacturer specific ADV data structure
 ADV_TYPE_MFG_DATA = const(0xFF)
 
+# ADV data frame type for the 16-bit UUID service data ADV data structure
+ADV_TYPE_SERVICE_DATA = const(0x16)
+
 # ADV data frame Frame type for complete local name
 _ADV_TYPE_COMPLETE_NAME = const(0x09)
 
+# Value for missing measurements in float columns
+_NAN = float("nan")
+
+# Struct formats of the integer ID fields by size
+_INT_FORMATS = {1: ">B", 2: ">H", 4: ">I"}
+
+# Placeholder company ID for decoders matching any manufacturer
+_ANY_COMPANY = const(0x10000)
+
+
+def _decoder_key(company_id, frame_type):
+    return company_id << 8 | frame_type
+
+
+# Decoder dispatch table. The first level is keyed on the AD type, the second
+# on the company ID (or service UUID) combined with the first byte following
+# it, which is the device type or frame type. Entries hold (module, class)
+# and are replaced with the class on first use.
+_DECODERS = {
+    ADV_TYPE_MFG_DATA: {
+        _decoder_key(0x004C, 0x02): ("ibeacon", "IBeacon"),
+        _decoder_key(0x0144, 0xFF): ("lintech", "LinTechBeacon"),
+        _decoder_key(0x0499, 0x03): ("ruuvitag", "RuuviTag"),
+        _decoder_key(0x0499, 0x05): ("ruuvitag", "RuuviTag"),
+        _decoder_key(0x094F, 0x01): ("mikrotik", "MikroTik"),
+        _decoder_key(_ANY_COMPANY, 0xBE): ("altbeacon", "AltBeacon"),
+    },
+    ADV_TYPE_SERVICE_DATA: {
+        _decoder_key(0xFEAA, 0x00): ("eddystone", "EddystoneUID"),
+        _decoder_key(0xFEAA, 0x10): ("eddystone", "EddystoneURL"),
+        _decoder_key(0xFEAA, 0x20): ("eddystone", "EddystoneTLM"),
+        _decoder_key(0xFEAA, 0x30): ("eddystone", "EddystoneEID"),
+    },
+}
+
 
 def _unique_id():
     """Function to generate a unique ID based on the platform"""
@@ -31,44 +96,235 @@ def _unique_id():
         import machine
 
         return hexlify(machine.unique_id()[4:]).upper()
+    return sys.platform.upper().encode()
+
+
+def _ad_length(adv_data, offset):
+    """
+    Return the length of the ADV data structure at the offset, or 0 at the end
+    of the advertising data, at padding and if the structure is truncated
+    """
+    size = len(adv_data)
+    if offset + 1 >= size:
+        return 0
+    length = adv_data[offset]
+    if offset + length >= size:
+        return 0
+    return length
+
+
+def _find_ad_structure(adv_data, ad_type, offset=0):
+    """
+    Return the offset of the first ADV data structure of the AD type from the
+    offset on, or -1 if there is none before the end of the advertising data,
+    padding or a truncated structure
+    """
+    while True:
+        length = _ad_length(adv_data, offset)
+        if not length:
+            return -1
+        if adv_data[offset + 1] == ad_type:
+            return offset
+        offset += length + 1
+
+
+class AdvPayload:
+    """
+    Index of the ADV data structures in the advertising data, built in a
+    single pass. Maps each AD type to the offset of its first ADV data
+    structure, which can be passed to the beacon decode methods.
+    """
+
+    __slots__ = ("adv_data", "_index")
+
+    def __init__(self, adv_data):
+        self.adv_data = adv_data
+        self._index = index = {}
+
+        i = 0
+        while True:
+            length = _ad_length(adv_data, i)
+            if not length:
+                break
+            if adv_data[i + 1] not in index:
+                index[adv_data[i + 1]] = i
+            i += length + 1
+
+    def __contains__(self, ad_type):
+        return ad_type in self._index
+
+    def offset(self, ad_type):
+        """Offset of the first ADV data structure of the AD type, or -1"""
+        return self._index.get(ad_type, -1)
+
+    def get(self, ad_type):
+        """
+        Data of the first ADV data structure of the AD type as memoryview, or
+        None if there is none
+        """
+        i = self._index.get(ad_type)
+        if i is None:
+            return None
+        return memoryview(self.adv_data)[i + 2 : i + 1 + self.adv_data[i]]
+
+    def decode(self, beacon_class):
+        """
+        Decode the first ADV data structure of the AD type of the beacon
+        class, returns None if there is none
+        """
+        i = self._index.get(beacon_class._AD_TYPE)
+        if i is None:
+            return None
+        return beacon_class(adv_data=self.adv_data, offset=i)
+
+
+def adv_field(name, offset=None, fmt=None):
+    """
+    Create a beacon attribute which marks the cached advertising data as stale
+    when it is set. If the offset and struct format of the field within the
+    advertising data are given, the cached data is patched in place instead.
+    """
+    attr = "_" + name
+
+    def getter(self):
+        return getattr(self, attr)
+
+    def setter(self, value):
+        if offset is not None and not self._adv_stale:
+            pack_into(fmt, self._adv, offset, value)
+        else:
+            self._adv_stale = True
+        setattr(self, attr, value)
+
+    return property(getter, setter)
 
 
 class ubeaconDecorators:
     @classmethod
     def remove_adv_header(cls, decorated):
-        """Decorator to remove the ADV data flags header if any"""
+        """
+        Decorator to skip the ADV data structures before the first one of the
+        AD type of the beacon, or else the ADV data flags header if any. Data
+        without such a structure, i.e. a raw beacon payload, is left as is.
+        Reports the decoding to the instrumentation, if enabled.
+        """
 
-        def inner(cls, adv_data):
-            if adv_data[:2] == bytes([0x02, 0x01]):
-                adv_data = adv_data[3:]
-            decorated(cls, adv_data)
+        def inner(self, adv_data, offset=0):
+            stats = _stats
+            if stats is not None:
+                start = stats.start()
+
+            try:
+                found = _find_ad_structure(adv_data, self._AD_TYPE, offset)
+                if found >= 0:
+                    offset = found
+                elif (
+                    len(adv_data) > offset + 1
+                    and adv_data[offset] == FLAGS_LENGTH
+                    and adv_data[offset + 1] == FLAGS_TYPE
+                ):
+                    offset += FLAGS_LENGTH + 1
+                decorated(self, adv_data, offset)
+            except (ValueError, IndexError) as error:
+                if stats is not None:
+                    stats.failed(self.__class__, error)
+                raise
+
+            if stats is not None:
+                stats.stop(self.__class__, start)
 
         return inner
 
 
 class UUID:
+    """
+    16-byte UUID which is only formatted as string on demand. Hashing and
+    equality are based on the raw bytes, so a UUID compares equal to other
+    UUIDs and bytes but not to UUID strings. Convert strings with
+    Beacon.uuid_to_bin to compare or look them up.
+    """
+
+    __slots__ = ("_bytes", "_str")
+
     def __init__(self, bytes):
         if len(bytes) != 16:
             raise ValueError("bytes arg must be 16 bytes long")
         self._bytes = bytes
+        self._str = None
+
+    @property
+    def bytes(self):
+        return self._bytes
 
     @property
     def hex(self):
         return hexlify(self._bytes).decode()
 
     def __str__(self):
-        h = self.hex
-        return "-".join((h[0:8], h[8:12], h[12:16], h[16:20], h[20:32]))
+        if self._str is None:
+            h = self.hex
+            self._str = "-".join((h[0:8], h[8:12], h[12:16], h[16:20], h[20:32]))
+        return self._str
 
     def __repr__(self):
         return f"UUID({str(self)})"
 
+    def __hash__(self):
+        return hash(self._bytes)
+
+    def __eq__(self, other):
+        if isinstance(other, UUID):
+            return self._bytes == other._bytes
+        if isinstance(other, (bytes, bytearray)):
+            return self._bytes == other
+        return NotImplemented
+
+    def __ne__(self, other):
+        return not self == other
+
 
 class Beacon:
     """Base class for all beacons. Should not be used by itself."""
 
-    # Use the Wifi MAC address to get a 2-byte unique id
-    name = b"ubeacon " + _unique_id()
+    __slots__ = ("_name", "_adv", "_adv_stale", "_resp")
+
+    # Name with a 2-byte unique id from the MAC address, set on first use as
+    # reading the MAC address activates the radio on the ESP32
+    _default_name = None
+
+    # Beacon field names and the array typecodes used by decode_many. A
+    # typecode of None stores the distinct values in a list and an index into
+    # it per payload.
+    _FIELDS = ()
+
+    # Integer fields which can be missing, decode_many stores whether they are
+    # set in a "has_<name>" column
+    _OPTIONAL_FIELDS = ()
+
+    # Offset and size of the beacon ID fields from the start of the ADV data
+    # structure, used to match filters against undecoded advertising data
+    _RAW_FIELDS = {}
+
+    # Offset of the ADV data structure after the flags as encoded by the
+    # beacon, and the (offset, value) pairs identifying the beacon type within
+    # it. Used by encode_many and to match byte patterns at the usual offset
+    # before searching the ADV data structure.
+    _RAW_OFFSET = 0
+    _RAW_TYPE = ()
+
+    # Signal loss from the distance the reference RSSI is measured at to 1m
+    _REFERENCE_LOSS_1M = 0
+
+    # AD type of the ADV data structure holding the beacon data
+    _AD_TYPE = ADV_TYPE_MFG_DATA
+
+    def __init__(self):
+        self._name = None
+
+        # Cached advertising and response data
+        self._adv = None
+        self._adv_stale = True
+        self._resp = None
 
     def __str__(self):
         """Convert the advertising data to a human-readable string"""
@@ -77,46 +333,190 @@ class Beacon:
 
     def __repr__(self):
         """Convert the object representation to a string"""
-        return "{}({!r})".format(self.__class__.__name__, self.__dict__)
+        return "{}({})".format(
+            self.__class__.__name__,
+            ", ".join(
+                "{}={!r}".format(name, getattr(self, name)) for name, _ in self._FIELDS
+            ),
+        )
 
     @property
-    def adv(self):
+    def name(self):
+        """Get the beacon name included in the response data"""
+        if self._name is None:
+            if self._default_name is None:
+                Beacon._default_name = b"ubeacon " + _unique_id()
+            return self._default_name
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        self._name = value
+        self._resp = None
+
+    def encode(self, adv=None):
         """
-        Generate the advertising data for the AltBeacon (needs to be
-        implemented in child classes)
+        Encode the advertising data into the adv bytearray, or a new one if
+        adv is None or has the wrong size (needs to be implemented in child
+        classes)
         """
         raise NotImplementedError("ADV Data is not supported")
 
+    @property
+    def adv(self):
+        """Get the advertising data as list"""
+        return list(self.adv_data)
+
     @property
     def adv_data(self):
-        """Get the advertising data as bytes"""
-        return bytes(self.adv)
+        """
+        Get the advertising data as bytearray. The data is encoded once and
+        the same buffer is reused until one of the beacon fields is changed,
+        so it must not be modified by the caller.
+        """
+        if self._adv_stale:
+            self._adv = self.encode(self._adv)
+            self._adv_stale = False
+        return self._adv
 
     @property
     def resp(self):
-        """Generate response data for beacon"""
-        return [
-            FLAGS_LENGTH,
-            FLAGS_TYPE,
-            FLAGS_DATA,
-            len(self.name) + 1,
-            _ADV_TYPE_COMPLETE_NAME,
-        ] + [x for x in self.name]
+        """Get the response data as list"""
+        return list(self.resp_bytes)
 
     @property
     def resp_bytes(self):
-        """Get the response data as bytes"""
-        return bytes(self.resp)
-
-    def decode(self, adv_data):
+        """Get the cached response data as bytearray"""
+        if self._resp is None:
+            name = self.name
+            resp = bytearray(len(name) + 5)
+            resp[0] = FLAGS_LENGTH
+            resp[1] = FLAGS_TYPE
+            resp[2] = FLAGS_DATA
+            resp[3] = len(name) + 1
+            resp[4] = _ADV_TYPE_COMPLETE_NAME
+            resp[5:] = name
+            self._resp = resp
+        return self._resp
+
+    def decode(self, adv_data, offset=0):
         """
-        Placeholder method to decode received advertising data (needs to be
-        implemented in child classes)
+        Placeholder method to decode received advertising data starting at
+        offset (needs to be implemented in child classes)
         """
         raise NotImplementedError("No decode method in child class implemented")
 
+    @classmethod
+    def decode_many(cls, payloads, *, skip_invalid=False):
+        """
+        Decode advertising payloads of the same beacon type into a dict of
+        column arrays instead of one beacon object per payload. Values of
+        non-numeric columns are stored once in a list under the column name
+        and referenced per payload from the "<name>_index" column. Missing
+        values are stored as NaN in float columns. Integer columns of optional
+        fields store 0 instead and have a "has_<name>" column which is 0 for
+        missing and 1 for available values.
+        """
+        columns = {}
+        indexes = {}
+        for name, typecode in cls._FIELDS:
+            if typecode is None:
+                columns[name] = []
+                columns[name + "_index"] = array("I")
+                indexes[name] = {}
+            else:
+                columns[name] = array(typecode)
+
+        available = {}
+        for name in cls._OPTIONAL_FIELDS:
+            available[name] = columns["has_" + name] = array("B")
+
+        beacon = None
+        for adv_data in payloads:
+            try:
+                if beacon is None:
+                    beacon = cls(adv_data=adv_data)
+                else:
+                    beacon.decode(adv_data)
+            except (ValueError, IndexError):
+                if skip_invalid:
+                    continue
+                raise
+
+            for name, typecode in cls._FIELDS:
+                value = getattr(beacon, name)
+                if typecode is None:
+                    index = indexes[name].get(value)
+                    if index is None:
+                        index = indexes[name][value] = len(columns[name])
+                        columns[name].append(value)
+                    columns[name + "_index"].append(index)
+                else:
+                    if name in available:
+                        available[name].append(0 if value is None else 1)
+                    if value is None:
+                        value = _NAN if typecode in "fd" else 0
+                    columns[name].append(value)
+
+        return columns
+
+    def encode_many(self, **fields):
+        """
+        Encode the advertising data of many beacons into one contiguous
+        bytearray, using this beacon as template. Each keyword argument is a
+        sequence of values for one of the ID fields, i.e. ranges of major and
+        minor, all of the same length. Values of longer fields like the
+        Eddystone instance can be ints too. Frame i of the result starts at
+        i * len(self.adv_data).
+        """
+        adv = self.adv_data
+        size = len(adv)
+
+        # The ID fields are located from the start of the ADV data structure
+        base = self._RAW_OFFSET
+        if size > 1 and adv[0] == FLAGS_LENGTH and adv[1] == FLAGS_TYPE:
+            base += FLAGS_LENGTH + 1
+
+        count = None
+        layout = []
+        for name, values in fields.items():
+            field = self._RAW_FIELDS.get(name)
+            if field is None:
+                raise ValueError("Field {} not supported by beacon".format(name))
+            if count is None:
+                count = len(values)
+            elif len(values) != count:
+                raise ValueError("Fields must have the same number of values")
+            layout.append((base + field[0], field[1], name, values))
+
+        if count is None:
+            return bytearray(adv)
+
+        # Copy the template once per frame and only write the varying fields
+        buffer = bytearray(bytes(adv) * count)
+        for offset, length, name, values in layout:
+            fmt = _INT_FORMATS.get(length)
+            for value in values:
+                if isinstance(value, int):
+                    if fmt is None:
+                        buffer[offset : offset + length] = value.to_bytes(length, "big")
+                    else:
+                        pack_into(fmt, buffer, offset, value)
+                else:
+                    if name == "uuid":
+                        value = self.uuid_to_bin(value)
+                    elif isinstance(value, str):
+                        value = unhexlify(value)
+                    buffer[offset : offset + length] = self.validate(value, length)
+                offset += size
+        return buffer
+
     @staticmethod
     def uuid_to_bin(uuid):
+        if isinstance(uuid, UUID):
+            return uuid.bytes
+        if isinstance(uuid, bytes):
+            return uuid
         uuid = uuid.replace("-", "")
         return unhexlify(uuid.encode())
 
@@ -139,10 +539,26 @@ class Beacon:
         return _bytes
 
 
-class BeaconFilter:
-    """Beacon filter class"""
+# Filter types with hex string values, compared in lowercase
+_HEX_FILTERS = ("namespace", "instance", "namespace_prefix")
 
-    filter_types = ["uuid", "major", "minor", "namespace", "instance"]
+
+class BeaconFilter:
+    """
+    Beacon filter class. A filter value can be a single value, a list or
+    tuple of values or a range. The namespace_prefix filter matches Eddystone
+    namespaces starting with the given hex string. Hex strings are matched
+    case insensitive.
+    """
+
+    filter_types = [
+        "uuid",
+        "major",
+        "minor",
+        "namespace",
+        "instance",
+        "namespace_prefix",
+    ]
 
     def __init__(self, **kwargs):
         self.properties = {}
@@ -150,13 +566,150 @@ class BeaconFilter:
         for key, value in kwargs.items():
             if key not in self.filter_types:
                 raise ValueError("Filter type not available.")
+            if key == "uuid":
+                # UUIDs are matched on the raw bytes
+                if isinstance(value, (list, tuple)):
+                    value = [Beacon.uuid_to_bin(uuid) for uuid in value]
+                else:
+                    value = Beacon.uuid_to_bin(value)
+            elif key in _HEX_FILTERS:
+                if isinstance(value, (list, tuple)):
+                    value = [v.lower() for v in value]
+                else:
+                    value = value.lower()
             self.properties[key] = value
 
     def match(self, beacon):
         """Check if the filter matches the supplied properties."""
 
         for key, value in self.properties.items():
-            if getattr(beacon, key) != value:
+            if key == "namespace_prefix":
+                if not beacon.namespace.lower().startswith(value):
+                    return False
+                continue
+
+            field = getattr(beacon, key)
+            if key == "uuid":
+                field = Beacon.uuid_to_bin(field)
+            elif key in _HEX_FILTERS:
+                field = field.lower()
+            if isinstance(value, (list, tuple, range)):
+                if field not in value:
+                    return False
+            elif field != value:
                 return False
 
         return True
+
+    def pattern(self, beacon_class):
+        """
+        Compile the filter into a BytePattern matching the undecoded advertising
+        data of the beacon class
+        """
+        from .filters import BytePattern
+
+        return BytePattern(self, beacon_class)
+
+
+# Instrumentation receiving the decoding events, see instrument()
+_stats = None
+
+
+def instrument(stats):
+    """
+    Report classified packets, decode time, allocations and failures to
+    stats, i.e. a ubeacon.stats.DecodeStats, or disable the instrumentation
+    with None. Disabled, decoding only checks for it once per call.
+    """
+    global _stats
+    _stats = stats
+
+
+def _load_decoder(decoders, key):
+    """Resolve a dispatch table entry to the beacon class"""
+    decoder = decoders[key]
+    if isinstance(decoder, tuple):
+        module, name = decoder
+        try:
+            module = __import__(__name__ + "." + module, None, None, (name,))
+            decoder = getattr(module, name)
+        except ImportError:
+            # Beacon module has not been copied to the device
+            decoder = None
+        decoders[key] = decoder
+    return decoder
+
+
+def find_decoder(adv_data):
+    """
+    Walk the ADV data structures once and return the beacon class able to
+    decode the advertising data together with the offset of its ADV data
+    structure, or (None, -1) if the beacon type is unknown
+    """
+    i = 0
+    while True:
+        length = _ad_length(adv_data, i)
+        if not length:
+            break
+
+        decoders = _DECODERS.get(adv_data[i + 1])
+        if decoders is not None and length >= 4:
+            frame_type = adv_data[i + 4]
+            key = _decoder_key(adv_data[i + 2] | adv_data[i + 3] << 8, frame_type)
+            if key not in decoders:
+                key = _decoder_key(_ANY_COMPANY, frame_type)
+            if key in decoders:
+                return _load_decoder(decoders, key), i
+
+        i += length + 1
+
+    return None, -1
+
+
+def classify(adv_data):
+    """
+    Return the beacon class able to decode the advertising data, or None if
+    the beacon type is unknown
+    """
+    beacon_class = find_decoder(adv_data)[0]
+    if _stats is not None:
+        _stats.classified(beacon_class)
+    return beacon_class
+
+
+def decode(adv_data):
+    """
+    Decode the advertising data into the matching beacon object. Returns None
+    if the beacon type is unknown or the advertising data is invalid.
+    """
+    beacon_class, offset = find_decoder(adv_data)
+    if _stats is not None:
+        _stats.classified(beacon_class)
+    if beacon_class is None:
+        return None
+
+    try:
+        return beacon_class(adv_data=adv_data, offset=offset)
+    except (ValueError, IndexError):
+        return None
+
+
+def decode_batch(payloads):
+    """
+    Decode a list of advertising payloads into column arrays, returned as a
+    dict mapping each beacon class to the result of its decode_many. Unknown
+    and invalid payloads are skipped.
+    """
+    groups = {}
+    for adv_data in payloads:
+        beacon_class = classify(adv_data)
+        if beacon_class is not None:
+            if beacon_class in groups:
+                groups[beacon_class].append(adv_data)
+            else:
+                groups[beacon_class] = [adv_data]
+
+    return {
+        beacon_class: beacon_class.decode_many(group, skip_invalid=True)
+        for beacon_class, group in groups.items()
+    }
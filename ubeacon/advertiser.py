@@ -0,0 +1,105 @@
+"""
+Advertise several beacons from one device by rotating their frames
+"""
+
+from . import ticks_add, ticks_diff, ticks_ms
+
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+
+
+class Advertiser:
+    """
+    Rotate the advertising data of several beacons in time slots of slot_ms.
+    Beacons with a higher weight get proportionally more slots, spread
+    evenly over the rotation. The rotation is computed when beacons are
+    added or removed and the advertising data is encoded once, so switching
+    to the next beacon does not allocate.
+
+    The advertise hook is called with the advertising interval and the
+    advertising and response data of the beacon for the slot, i.e.
+    lambda interval_us, adv_data, resp_data: ble.gap_advertise(
+        interval_us, adv_data=adv_data, resp_data=resp_data
+    )
+    """
+
+    def __init__(self, advertise=None, interval_us=100_000, slot_ms=1000):
+        self.advertise = advertise
+        self.interval_us = interval_us
+        self.slot_ms = slot_ms
+        self._beacons = []
+        self._weights = []
+        self._schedule = []
+        self._position = 0
+
+    def __len__(self):
+        return len(self._beacons)
+
+    def add(self, beacon, weight=1):
+        """Add a beacon with the weight to the rotation"""
+        if weight < 1:
+            raise ValueError("Weight must be at least 1")
+        # Encode the advertising and response data once
+        beacon.adv_data
+        beacon.resp_bytes
+        self._beacons.append(beacon)
+        self._weights.append(weight)
+        self._reschedule()
+
+    def remove(self, beacon):
+        """Remove the beacon from the rotation"""
+        i = self._beacons.index(beacon)
+        del self._beacons[i]
+        del self._weights[i]
+        self._reschedule()
+
+    def _reschedule(self):
+        """Interleave the beacons by weight with smooth weighted round robin"""
+        weights = self._weights
+        total = sum(weights)
+        current = [0] * len(weights)
+        schedule = []
+        for _ in range(total):
+            best = 0
+            for i, weight in enumerate(weights):
+                current[i] += weight
+                if current[i] > current[best]:
+                    best = i
+            current[best] -= total
+            schedule.append(self._beacons[best])
+        self._schedule = schedule
+        self._position = 0
+
+    def next(self):
+        """Return the beacon for the next slot"""
+        schedule = self._schedule
+        if not schedule:
+            raise ValueError("No beacons to advertise")
+        beacon = schedule[self._position]
+        self._position = (self._position + 1) % len(schedule)
+        return beacon
+
+    def advertise_next(self):
+        """Pass the data of the beacon for the next slot to the advertise hook"""
+        beacon = self.next()
+        # The cached data of the beacon is only encoded again after changes
+        self.advertise(self.interval_us, beacon.adv_data, beacon.resp_bytes)
+        return beacon
+
+    async def run(self, slots=None):
+        """
+        Advertise the next beacon every slot_ms, for the number of slots or
+        until cancelled. The slots are timed from the start, so the time
+        spent advertising does not add up.
+        """
+        deadline = ticks_ms()
+        while slots is None or slots > 0:
+            self.advertise_next()
+            if slots is not None:
+                slots -= 1
+            deadline = ticks_add(deadline, self.slot_ms)
+            delay = ticks_diff(deadline, ticks_ms())
+            if delay > 0:
+                await asyncio.sleep(delay / 1000)
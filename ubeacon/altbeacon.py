@@ -2,7 +2,7 @@
 AltBeacon Protocol Specification: https://github.com/AltBeacon/spec
 """
 
-from struct import pack, unpack
+from struct import pack_into, unpack_from
 
 from . import (
     UUID,
@@ -11,6 +11,8 @@ from . import (
     FLAGS_TYPE,
     FLAGS_DATA,
     ADV_TYPE_MFG_DATA,
+    adv_field,
+    const,
     ubeaconDecorators,
 )
 
@@ -31,8 +33,48 @@ _MFG_RESERVED = const(0x01)
 # A 1-byte value representing the average received signal strength at 1m from the advertiser
 _REFERENCE_RSSI = const(-70)
 
+# Size of the advertising data including the flags
+_ADV_SIZE = const(31)
+
+# Advertising data up to the company ID
+_ADV_HEADER = bytes(
+    (FLAGS_LENGTH, FLAGS_TYPE, FLAGS_DATA, _ADV_LENGTH, ADV_TYPE_MFG_DATA)
+)
+
 
 class AltBeacon(Beacon):
+    __slots__ = (
+        "_company_id",
+        "_uuid",
+        "_major",
+        "_minor",
+        "_reference_rssi",
+        "_mfg_reserved",
+    )
+
+    _FIELDS = (
+        ("company_id", "H"),
+        ("uuid", None),
+        ("major", "H"),
+        ("minor", "H"),
+        ("reference_rssi", "b"),
+        ("mfg_reserved", "B"),
+    )
+
+    _RAW_FIELDS = {"uuid": (6, 16), "major": (22, 2), "minor": (24, 2)}
+    _RAW_TYPE = (
+        (1, ADV_TYPE_MFG_DATA),
+        (4, _DEVICE_TYPE >> 8),
+        (5, _DEVICE_TYPE & 0xFF),
+    )
+
+    company_id = adv_field("company_id", 5, "<H")
+    uuid = adv_field("uuid")
+    major = adv_field("major", 25, ">H")
+    minor = adv_field("minor", 27, ">H")
+    reference_rssi = adv_field("reference_rssi", 29, ">b")
+    mfg_reserved = adv_field("mfg_reserved")
+
     def __init__(
         self,
         company_id=_COMPANY_ID,  # 0 - 255
@@ -43,10 +85,13 @@ class AltBeacon(Beacon):
         mfg_reserved=_MFG_RESERVED,  # 1-byte
         *,
         adv_data=None,
+        offset=0,
     ):
+        super().__init__()
+
         # If adv_data is provided, decode it to initialize the beacon
         if adv_data:
-            self.decode(adv_data)
+            self.decode(adv_data, offset)
         # If uuid, major and minor are provided, use them to initialize the beacon
         elif uuid and major and minor:
             self.company_id = company_id
@@ -59,39 +104,30 @@ class AltBeacon(Beacon):
             # If neither adv_data nor required IDs are provided, raise an error
             raise ValueError("Could not initialize beacon")
 
-    @property
-    def adv(self):
-        """Generate the advertising data for the AltBeacon"""
-        return (
-            [
-                FLAGS_LENGTH,
-                FLAGS_TYPE,
-                FLAGS_DATA,
-                _ADV_LENGTH,
-                ADV_TYPE_MFG_DATA,
-            ]
-            + [x for x in self.validate(pack("<H", self.company_id), 2)]
-            + [x for x in pack(">H", _DEVICE_TYPE)]
-            + [x for x in self.validate(self.uuid_to_bin(self.uuid), 16)]
-            + [x for x in self.validate(pack(">H", self.major), 2)]
-            + [x for x in self.validate(pack(">H", self.minor), 2)]
-            + [
-                self.validate(pack(">b", self.reference_rssi), 1)[0],
-                self.validate(self.mfg_reserved, 1)[0],
-            ]
-        )
+    def encode(self, adv=None):
+        """Encode the advertising data for the AltBeacon"""
+        if adv is None:
+            adv = bytearray(_ADV_SIZE)
+            adv[:5] = _ADV_HEADER
+            pack_into(">H", adv, 7, _DEVICE_TYPE)
+
+        pack_into("<H", adv, 5, self.company_id)
+        adv[9:25] = self.validate(self.uuid_to_bin(self.uuid), 16)
+        pack_into(">HHb", adv, 25, self.major, self.minor, self.reference_rssi)
+        adv[30] = self.validate(self.mfg_reserved, 1)[0]
+        return adv
 
     @ubeaconDecorators.remove_adv_header
-    def decode(self, adv_data):
+    def decode(self, adv_data, offset=0):
         """
         Decode the received advertising data and set the corresponding attributes
         """
-        if len(adv_data[1:]) != _ADV_LENGTH:
+        if adv_data[offset] != _ADV_LENGTH or len(adv_data) <= offset + _ADV_LENGTH:
             raise ValueError("Invalid size")
 
-        self.company_id = unpack("<H", adv_data[2:4])[0]
-        self.uuid = str(UUID(adv_data[6:22]))
-        self.major = unpack(">H", adv_data[22:24])[0]
-        self.minor = unpack(">H", adv_data[24:26])[0]
-        self.reference_rssi = unpack(">b", bytes([adv_data[26]]))[0]
-        self.mfg_reserved = adv_data[27]
+        self.company_id = unpack_from("<H", adv_data, offset + 2)[0]
+        self.uuid = UUID(bytes(adv_data[offset + 6 : offset + 22]))
+        self.major, self.minor, self.reference_rssi = unpack_from(
+            ">HHb", adv_data, offset + 22
+        )
+        self.mfg_reserved = adv_data[offset + 27]
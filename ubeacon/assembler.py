@@ -0,0 +1,97 @@
+"""
+Merge advertising and scan response data per device before decoding
+"""
+
+from collections import OrderedDict
+
+from . import const, ticks_diff, ticks_ms
+
+
+# Advertising event types of the _IRQ_SCAN_RESULT event
+ADV_IND = const(0x00)
+ADV_DIRECT_IND = const(0x01)
+ADV_SCAN_IND = const(0x02)
+ADV_NONCONN_IND = const(0x03)
+SCAN_RSP = const(0x04)
+
+
+class ScanAssembler:
+    """
+    Reassemble the advertising data of scannable advertisements (ADV_IND and
+    ADV_SCAN_IND) with the following scan response (SCAN_RSP) of the same
+    device, so each device is decoded once per advertising event with the
+    complete data. Advertising data waiting for a scan response is kept in a
+    bounded LRU per address, the least recently seen device is evicted if it
+    is full. Call expire() regularly to get the advertising data which did not
+    get a scan response, including the evicted one.
+    """
+
+    def __init__(self, maxsize=64, timeout_ms=1000):
+        self.maxsize = maxsize
+        self.timeout_ms = timeout_ms
+        self.merged = 0
+        self.evicted = 0
+        self._pending = OrderedDict()  # addr -> (adv_data, ticks)
+        self._evicted = []  # (addr, adv_data) returned by the next expire()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, addr, adv_type, adv_data, now=None):
+        """
+        Add the advertising data of a scan result. Returns the advertising
+        data to decode, merged with the scan response if any, or None while
+        waiting for the scan response. If the device advertises again before
+        its scan response, i.e. with passive scanning, the previous
+        advertising data is returned without it.
+        """
+        if not isinstance(addr, bytes):
+            addr = bytes(addr)
+        pending = self._pending
+
+        if adv_type == SCAN_RSP:
+            entry = pending.pop(addr, None)
+            if entry is None:
+                # Advertising data missed or already timed out
+                return bytes(adv_data)
+            self.merged += 1
+            return entry[0] + bytes(adv_data)
+
+        if adv_type != ADV_IND and adv_type != ADV_SCAN_IND:
+            # Not scannable, there is no scan response
+            return bytes(adv_data)
+
+        if now is None:
+            now = ticks_ms()
+        previous = pending.pop(addr, None)
+        if previous is None and len(pending) >= self.maxsize:
+            self.evicted += 1
+            oldest = next(iter(pending))
+            self._evicted.append((oldest, pending.pop(oldest)[0]))
+        # Copy, the buffer of the scan result is reused
+        pending[addr] = (bytes(adv_data), now)
+        if previous is not None:
+            # No scan response for the previous advertising event
+            return previous[0]
+        return None
+
+    def expire(self, now=None):
+        """
+        Return a list of (addr, adv_data) of the advertising data which did
+        not get a scan response within timeout_ms or was evicted since the
+        last call
+        """
+        if now is None:
+            now = ticks_ms()
+
+        expired = self._evicted
+        self._evicted = []
+        pending = self._pending
+        while pending:
+            addr = next(iter(pending))
+            adv_data, ticks = pending[addr]
+            if ticks_diff(now, ticks) < self.timeout_ms:
+                break
+            del pending[addr]
+            expired.append((addr, adv_data))
+        return expired
@@ -0,0 +1,64 @@
+"""
+Cache for decoded beacons to skip decoding identical advertising data
+"""
+
+from collections import OrderedDict
+
+from . import decode, ticks_diff, ticks_ms
+
+
+class SightingCache:
+    """
+    Bounded LRU cache of the decoded beacons keyed on the device address and
+    the advertising data. Identical advertising data from the same device
+    returns the cached beacon until the entry is older than ttl_ms, also if
+    the device interleaves several frames, i.e. Eddystone UID and TLM. With
+    suppress set, None is returned for identical advertising data instead, so
+    each frame is only emitted again after ttl_ms expired.
+    """
+
+    def __init__(self, maxsize=64, ttl_ms=10_000, *, suppress=False, decoder=decode):
+        self.maxsize = maxsize
+        self.ttl_ms = ttl_ms
+        self.suppress = suppress
+        self.decoder = decoder
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # (addr, adv_data) -> [beacon, ticks]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        """Remove all entries"""
+        self._entries = OrderedDict()
+
+    def decode(self, addr, adv_data, now=None):
+        """
+        Decode the advertising data of the device with the address, or return
+        the cached beacon for identical advertising data. Unknown and invalid
+        advertising data are cached as None.
+        """
+        if now is None:
+            now = ticks_ms()
+        if not isinstance(addr, bytes):
+            addr = bytes(addr)
+        if not isinstance(adv_data, bytes):
+            adv_data = bytes(adv_data)
+
+        key = (addr, adv_data)
+        entries = self._entries
+        entry = entries.pop(key, None)
+        if entry is not None and ticks_diff(now, entry[1]) < self.ttl_ms:
+            self.hits += 1
+            entries[key] = entry  # Most recently used
+            return None if self.suppress else entry[0]
+
+        self.misses += 1
+        if entry is None and len(entries) >= self.maxsize:
+            # Evict the least recently used frame
+            del entries[next(iter(entries))]
+
+        beacon = self.decoder(adv_data)
+        entries[key] = [beacon, now]
+        return beacon
@@ -0,0 +1,136 @@
+"""
+Binary capture format for advertising data
+
+A capture starts with an 8 byte file header, the magic b"UBCP" and the
+format version, followed by records of a 16 byte little endian header and
+the advertising data:
+
+    timestamp in milliseconds  u64
+    device address             6 bytes
+    RSSI                       i8
+    advertising data length    u8
+"""
+
+import time
+from struct import pack_into, unpack_from
+
+from . import const
+
+MAGIC = b"UBCP"
+VERSION = const(1)
+
+_FILE_HEADER = "<4sB"
+_FILE_HEADER_SIZE = const(8)
+_RECORD_HEADER = "<Q6sbB"
+_RECORD_HEADER_SIZE = const(16)
+
+
+def check_header(buffer):
+    """Raise ValueError if the buffer does not start with a capture header"""
+    if len(buffer) < _FILE_HEADER_SIZE:
+        raise ValueError("Missing capture header")
+    magic, version = unpack_from(_FILE_HEADER, buffer, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a capture")
+    if version != VERSION:
+        raise ValueError("Unsupported capture version {}".format(version))
+
+
+def records(buffer, start=_FILE_HEADER_SIZE, end=None):
+    """
+    Iterate the records in the buffer as (timestamp_ms, addr, rssi,
+    adv_data) tuples. The advertising data is a memoryview of the buffer.
+    Raises ValueError at a record cut off before the end, i.e. if the
+    gateway lost power while writing it.
+    """
+    view = memoryview(buffer)
+    if end is None:
+        end = len(view)
+    offset = start
+    while offset < end:
+        if offset + _RECORD_HEADER_SIZE > end:
+            raise ValueError("Truncated record")
+        timestamp_ms, addr, rssi, length = unpack_from(_RECORD_HEADER, view, offset)
+        offset += _RECORD_HEADER_SIZE
+        if offset + length > end:
+            raise ValueError("Truncated record")
+        yield timestamp_ms, addr, rssi, view[offset : offset + length]
+        offset += length
+
+
+class CaptureWriter:
+    """Append advertising data records to a file opened in binary mode"""
+
+    def __init__(self, f):
+        self._f = f
+        self._header = bytearray(_RECORD_HEADER_SIZE)
+        if f.tell() == 0:
+            header = bytearray(_FILE_HEADER_SIZE)
+            pack_into(_FILE_HEADER, header, 0, MAGIC, VERSION)
+            f.write(header)
+
+    def write(self, addr, rssi, adv_data, timestamp_ms=None):
+        if timestamp_ms is None:
+            timestamp_ms = time.time_ns() // 1_000_000
+        pack_into(
+            _RECORD_HEADER, self._header, 0, timestamp_ms, addr, rssi, len(adv_data)
+        )
+        self._f.write(self._header)
+        self._f.write(adv_data)
+
+
+class CaptureReader:
+    """
+    Memory map a capture file to iterate the records without copying the
+    advertising data. Release the memoryviews of the records, or copy them
+    with bytes(), before closing the reader.
+    """
+
+    def __init__(self, path):
+        import mmap
+
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            check_header(self._mmap)
+        except ValueError:
+            self._mmap.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __iter__(self):
+        return records(self._mmap)
+
+    def close(self):
+        self._mmap.close()
+
+    def records(self, start=_FILE_HEADER_SIZE, end=None):
+        return records(self._mmap, start, end)
+
+    def ranges(self, count):
+        """
+        Split the records into (start, end) offsets of count records each,
+        raises ValueError if the last record is truncated
+        """
+        buffer = self._mmap
+        size = len(buffer)
+        start = offset = _FILE_HEADER_SIZE
+        found = 0
+        while offset < size:
+            if offset + _RECORD_HEADER_SIZE > size:
+                raise ValueError("Truncated record")
+            offset += _RECORD_HEADER_SIZE + buffer[offset + _RECORD_HEADER_SIZE - 1]
+            if offset > size:
+                raise ValueError("Truncated record")
+            found += 1
+            if found == count:
+                yield start, offset
+                start = offset
+                found = 0
+        if found:
+            yield start, offset
@@ -2,10 +2,11 @@
 Eddystone Protocol Specification: https://github.com/google/eddystone
 """
 
-from struct import pack, unpack
+from collections import OrderedDict
+from struct import pack, pack_into, unpack_from
 from binascii import hexlify, unhexlify
 
-from . import Beacon
+from . import Beacon, adv_field, const, ubeaconDecorators
 
 
 # A 1-byte value representing the average received signal strength at 0m from the advertiser
@@ -19,9 +20,27 @@ _EDDYSTONE_FRAME_LENGTH = const(0x17)
 _EDDYSTONE_FRAME_LENGTH_LEGACY = const(0x15)
 _EDDYSTONE_FRAME_TYPE_UID = const(0x00)
 _EDDYSTONE_FRAME_TYPE_URL = const(0x10)
+_EDDYSTONE_FRAME_TYPE_TLM = const(0x20)
+_EDDYSTONE_FRAME_TYPE_EID = const(0x30)
+_EDDYSTONE_FRAME_LENGTH_TLM = const(0x11)
+_EDDYSTONE_FRAME_LENGTH_ETLM = const(0x15)
+_EDDYSTONE_FRAME_LENGTH_EID = const(0x0D)
+_EDDYSTONE_TLM_VERSION = const(0x00)
+_EDDYSTONE_ETLM_VERSION = const(0x01)
+_EDDYSTONE_TLM_NO_TEMPERATURE = const(-0x8000)
 _EDDYSTONE_RESERVED = const(0x00)
 _EDDYSTONE_SERVICE_DATA = const(0x16)
 
+# Size of the UID advertising data and of the URL advertising data without URL
+_UID_ADV_SIZE = const(28)
+_URL_ADV_SIZE = const(11)
+
+# Complete list of 16-bit service UUIDs and the service data UUID
+_EDDYSTONE_SERVICE = bytes((_SERVICE_LENGTH, _SERVICE_UUID_TYPES)) + pack(
+    "<H", _EDDYSTONE_UUID
+)
+_EDDYSTONE_SERVICE_DATA_UUID = pack("<H", _EDDYSTONE_UUID)
+
 _URL_SCHEME = (
     b"http://www.",
     b"https://www.",
@@ -46,8 +65,126 @@ _URL_TLD = (
     b".gov",
 )
 
+# Default URL scheme code if the URL does not start with a known scheme
+_URL_SCHEME_DEFAULT = const(3)
+
+# Number of recently encoded URLs to keep
+_URL_CACHE_SIZE = const(8)
+
+
+def _trie(expansions):
+    """
+    Build a trie of nested dicts mapping each byte of the expansions to the
+    next node. The None key of a node holds the code of the expansion ending
+    there.
+    """
+    root = {}
+    for code, expansion in enumerate(expansions):
+        node = root
+        for byte in expansion:
+            node = node.setdefault(byte, {})
+        node[None] = code
+    return root
+
+
+_URL_SCHEME_TRIE = _trie(_URL_SCHEME)
+_URL_TLD_TRIE = _trie(_URL_TLD)
+
+# Encoded URLs by URL, in least recently used order
+_url_cache = OrderedDict()
+
+
+def _longest_match(trie, url, start):
+    """
+    Return the code and end of the longest expansion in the URL at start,
+    or None and start if there is none
+    """
+    code = None
+    end = start
+    node = trie
+    for i in range(start, len(url)):
+        node = node.get(url[i])
+        if node is None:
+            break
+        if None in node:
+            code = node[None]
+            end = i + 1
+    return code, end
+
+
+def _encode_url(url):
+    """
+    Compress the URL into the scheme code followed by the URL with the TLD
+    expansions replaced by their codes, in one pass over the URL
+    """
+    encoded = _url_cache.pop(url, None)
+    if encoded is None:
+        data = url.encode() if isinstance(url, str) else url
+        code, i = _longest_match(_URL_SCHEME_TRIE, data, 0)
+        encoded = bytearray((_URL_SCHEME_DEFAULT if code is None else code,))
+        while i < len(data):
+            code, end = _longest_match(_URL_TLD_TRIE, data, i)
+            if code is None:
+                encoded.append(data[i])
+                i += 1
+            else:
+                encoded.append(code)
+                i = end
+        encoded = bytes(encoded)
+
+        if len(_url_cache) >= _URL_CACHE_SIZE:
+            del _url_cache[next(iter(_url_cache))]
+    _url_cache[url] = encoded  # Most recently used
+    return encoded
+
+
+def _decode_url(adv_data, start, end):
+    """
+    Expand the encoded URL between start and end of the advertising data in
+    one pass, copying the runs between the TLD codes at once
+    """
+    data = adv_data[start + 1 : end]
+    url = bytearray(_URL_SCHEME[adv_data[start]])
+    run = 0
+    i = 0
+    for byte in data:
+        if byte < len(_URL_TLD):
+            url += data[run:i]
+            url += _URL_TLD[byte]
+            run = i + 1
+        i += 1
+    url += data[run:]
+    return str(url, "utf-8")
+
 
 class EddystoneUID(Beacon):
+    __slots__ = ("_namespace", "_instance", "_reference_rssi")
+
+    _FIELDS = (
+        ("namespace", None),
+        ("instance", None),
+        ("reference_rssi", "b"),
+    )
+
+    _RAW_FIELDS = {"namespace": (6, 10), "instance": (16, 6)}
+    _RAW_OFFSET = 4  # After the service UUID list
+    _RAW_TYPE = (
+        (1, _EDDYSTONE_SERVICE_DATA),
+        (2, _EDDYSTONE_UUID & 0xFF),
+        (3, _EDDYSTONE_UUID >> 8),
+        (4, _EDDYSTONE_FRAME_TYPE_UID),
+    )
+
+    namespace = adv_field("namespace")
+    instance = adv_field("instance")
+    reference_rssi = adv_field("reference_rssi", 9, ">b")
+
+    # The reference RSSI is measured at 0m
+    _REFERENCE_LOSS_1M = 41
+
+    # The beacon data is in the service data of the frame
+    _AD_TYPE = _EDDYSTONE_SERVICE_DATA
+
     def __init__(
         self,
         namespace=None,  # 10-bytes
@@ -55,10 +192,13 @@ class EddystoneUID(Beacon):
         reference_rssi=_REFERENCE_RSSI,  # 1-byte
         *,
         adv_data=None,
+        offset=0,
     ):
+        super().__init__()
+
         # If adv_data is provided, decode it to initialize the beacon
         if adv_data:
-            self.decode(adv_data)
+            self.decode(adv_data, offset)
         # If namespace_id and instance_id are provided, use them to initialize the beacon
         elif namespace and instance:
             self.namespace = namespace
@@ -68,53 +208,65 @@ class EddystoneUID(Beacon):
             # If neither adv_data nor required IDs are provided, raise an error
             raise ValueError("Could not initialize beacon")
 
-    @property
-    def adv(self):
-        """Generate the advertising data for the EddystoneUID beacon"""
-        return (
-            [
-                _SERVICE_LENGTH,
-                _SERVICE_UUID_TYPES,
-            ]
-            + [x for x in pack("<H", _EDDYSTONE_UUID)]
-            + [
-                _EDDYSTONE_FRAME_LENGTH,
-                _EDDYSTONE_SERVICE_DATA,
-            ]
-            + [x for x in pack("<H", _EDDYSTONE_UUID)]
-            + [
-                _EDDYSTONE_FRAME_TYPE_UID,
-                self.validate(pack(">b", self.reference_rssi), 1)[0],
-            ]
-            + [x for x in self.validate(unhexlify(self.namespace), 10)]
-            + [x for x in self.validate(unhexlify(self.instance), 6)]
-            + [
-                _EDDYSTONE_RESERVED,
-                _EDDYSTONE_RESERVED,
-            ]
-        )
+    def encode(self, adv=None):
+        """Encode the advertising data for the EddystoneUID beacon"""
+        if adv is None:
+            adv = bytearray(_UID_ADV_SIZE)
+            adv[:4] = _EDDYSTONE_SERVICE
+            adv[4] = _EDDYSTONE_FRAME_LENGTH
+            adv[5] = _EDDYSTONE_SERVICE_DATA
+            adv[6:8] = _EDDYSTONE_SERVICE_DATA_UUID
+            adv[8] = _EDDYSTONE_FRAME_TYPE_UID
+            adv[26] = _EDDYSTONE_RESERVED
+            adv[27] = _EDDYSTONE_RESERVED
+
+        pack_into(">b", adv, 9, self.reference_rssi)
+        adv[10:20] = self.validate(unhexlify(self.namespace), 10)
+        adv[20:26] = self.validate(unhexlify(self.instance), 6)
+        return adv
 
-    def decode(self, adv_data):
+    @ubeaconDecorators.remove_adv_header
+    def decode(self, adv_data, offset=0):
         """
         Decode the received advertising data and set the corresponding attributes
         """
-        adv_length = len(adv_data[5:])
+        frame_length = adv_data[offset]
         if (
-            adv_length != _EDDYSTONE_FRAME_LENGTH
-            and adv_length != _EDDYSTONE_FRAME_LENGTH_LEGACY
-        ):
+            frame_length != _EDDYSTONE_FRAME_LENGTH
+            and frame_length != _EDDYSTONE_FRAME_LENGTH_LEGACY
+        ) or len(adv_data) <= offset + frame_length:
             raise ValueError("Invalid size.")
 
-        self.reference_rssi = unpack(">b", bytes([adv_data[9]]))[0]
-        self.namespace = hexlify(adv_data[10:20]).decode()
-        self.instance = hexlify(adv_data[20:26]).decode()
+        self.reference_rssi = unpack_from(">b", adv_data, offset + 5)[0]
+        self.namespace = hexlify(adv_data[offset + 6 : offset + 16]).decode()
+        self.instance = hexlify(adv_data[offset + 16 : offset + 22]).decode()
 
 
 class EddystoneURL(Beacon):
-    def __init__(self, url=None, reference_rssi=_REFERENCE_RSSI, *, adv_data=None):
+    __slots__ = ("_url", "_reference_rssi")
+
+    _FIELDS = (
+        ("url", None),
+        ("reference_rssi", "b"),
+    )
+
+    url = adv_field("url")
+    reference_rssi = adv_field("reference_rssi", 9, ">b")
+
+    # The reference RSSI is measured at 0m
+    _REFERENCE_LOSS_1M = 41
+
+    # The beacon data is in the service data of the frame
+    _AD_TYPE = _EDDYSTONE_SERVICE_DATA
+
+    def __init__(
+        self, url=None, reference_rssi=_REFERENCE_RSSI, *, adv_data=None, offset=0
+    ):
+        super().__init__()
+
         # If adv_data is provided, decode it to initialize the beacon
         if adv_data:
-            self.decode(adv_data)
+            self.decode(adv_data, offset)
         # If url is provided, use it to initialize the beacon
         elif url:
             self.url = url.encode()
@@ -122,63 +274,234 @@ class EddystoneURL(Beacon):
         else:
             raise ValueError("Could not initialize beacon")
 
+    def encode(self, adv=None):
+        """Encode the advertising data for the EddystoneURL beacon"""
+        # URL scheme code followed by the encoded URL
+        url = _encode_url(self.url)
+
+        # The buffer size depends on the URL length
+        if adv is None or len(adv) != _URL_ADV_SIZE - 1 + len(url):
+            adv = bytearray(_URL_ADV_SIZE - 1 + len(url))
+            adv[:4] = _EDDYSTONE_SERVICE
+            adv[5] = _EDDYSTONE_SERVICE_DATA
+            adv[6:8] = _EDDYSTONE_SERVICE_DATA_UUID
+            adv[8] = _EDDYSTONE_FRAME_TYPE_URL
+
+        # Length is URL length plus first 5 bytes from Eddystone URL frame
+        adv[4] = len(url) + 5
+        pack_into(">b", adv, 9, self.reference_rssi)
+        adv[_URL_ADV_SIZE - 1 :] = url
+        return adv
+
+    @ubeaconDecorators.remove_adv_header
+    def decode(self, adv_data, offset=0):
+        """
+        Decode the received advertising data and set the corresponding attributes
+        """
+        frame_length = adv_data[offset]
+        self.url = _decode_url(adv_data, offset + 6, offset + frame_length + 1)
+        self.reference_rssi = unpack_from(">b", adv_data, offset + 5)[0]
+
+
+class EddystoneTLM(Beacon):
+    """
+    Telemetry frame, interleaved with the UID, URL or EID frames of the
+    beacon. The telemetry of encrypted TLM frames is not decoded, the
+    encrypted data, salt and message integrity check are kept as hex strings.
+    """
+
+    __slots__ = (
+        "version",
+        "battery_voltage",
+        "temperature",
+        "adv_count",
+        "sec_count",
+        "etlm",
+        "salt",
+        "mic",
+    )
+
+    _FIELDS = (
+        ("version", "B"),
+        ("battery_voltage", "H"),
+        ("temperature", "f"),
+        ("adv_count", "I"),
+        ("sec_count", "I"),
+        ("etlm", None),
+    )
+
+    # Not available in encrypted TLM frames
+    _OPTIONAL_FIELDS = ("battery_voltage", "adv_count", "sec_count")
+
+    _RAW_OFFSET = 4  # After the service UUID list
+    _RAW_TYPE = (
+        (1, _EDDYSTONE_SERVICE_DATA),
+        (2, _EDDYSTONE_UUID & 0xFF),
+        (3, _EDDYSTONE_UUID >> 8),
+        (4, _EDDYSTONE_FRAME_TYPE_TLM),
+    )
+
+    # The beacon data is in the service data of the frame
+    _AD_TYPE = _EDDYSTONE_SERVICE_DATA
+
+    def __init__(self, *, adv_data=None, offset=0):
+        super().__init__()
+
+        # If adv_data is provided, decode it to initialize the beacon
+        if adv_data:
+            self.decode(adv_data, offset)
+        else:
+            raise ValueError("Could not initialize beacon")
+
     @property
-    def adv(self):
-        """Generate the advertising data for the EddystoneURL beacon"""
-        url = self.url
-        url_scheme = 3
-
-        # Set URL scheme and remove scheme from url
-        for key, val in enumerate(_URL_SCHEME):
-            if url.startswith(val):
-                url = url.replace(val, b"")
-                url_scheme = key
-
-        # Find and replace top level domain
-        for key, val in enumerate(_URL_TLD):
-            if val in url:
-                url = url.replace(val, bytes([key]))
-
-        # Length is URL length plus first 6 bytes from Eddystone URL frame
-        url_frame_length = len(url) + 6
-
-        return (
-            [
-                _SERVICE_LENGTH,
-                _SERVICE_UUID_TYPES,
-            ]
-            + [x for x in pack("<H", _EDDYSTONE_UUID)]
-            + [
-                url_frame_length,
-                _EDDYSTONE_SERVICE_DATA,
-            ]
-            + [x for x in pack("<H", _EDDYSTONE_UUID)]
-            + [
-                _EDDYSTONE_FRAME_TYPE_URL,
-                self.validate(self.reference_rssi, 1)[0],
-                url_scheme,
-            ]
-            + [x for x in url]
-        )
+    def encrypted(self):
+        return self.version == _EDDYSTONE_ETLM_VERSION
 
-    def decode(self, adv_data):
+    @ubeaconDecorators.remove_adv_header
+    def decode(self, adv_data, offset=0):
         """
         Decode the received advertising data and set the corresponding attributes
         """
-        url = b""
+        frame_length = adv_data[offset]
+        if len(adv_data) <= offset + frame_length:
+            raise ValueError("Invalid size.")
+
+        self.version = adv_data[offset + 5]
+        if self.version == _EDDYSTONE_TLM_VERSION:
+            if frame_length != _EDDYSTONE_FRAME_LENGTH_TLM:
+                raise ValueError("Invalid size.")
+            (
+                self.battery_voltage,
+                temperature,
+                self.adv_count,
+                self.sec_count,
+            ) = unpack_from(">HhII", adv_data, offset + 6)
 
-        # Only Eddystone URL frame
-        adv_data = adv_data[4:]
-        frame_length = adv_data[0]
+            # Signed 8.8 fixed point, 0x8000 if not supported
+            if temperature == _EDDYSTONE_TLM_NO_TEMPERATURE:
+                self.temperature = None
+            else:
+                self.temperature = temperature / 256
+            self.etlm = self.salt = self.mic = None
+        elif self.version == _EDDYSTONE_ETLM_VERSION:
+            if frame_length != _EDDYSTONE_FRAME_LENGTH_ETLM:
+                raise ValueError("Invalid size.")
+            self.etlm = hexlify(adv_data[offset + 6 : offset + 18]).decode()
+            self.salt = hexlify(adv_data[offset + 18 : offset + 20]).decode()
+            self.mic = hexlify(adv_data[offset + 20 : offset + 22]).decode()
+            self.battery_voltage = self.temperature = None
+            self.adv_count = self.sec_count = None
+        else:
+            raise ValueError("Unknown TLM version")
+
+
+class EddystoneEID(Beacon):
+    """Ephemeral ID frame with the 8-byte ephemeral identifier as hex string"""
+
+    __slots__ = ("eid", "reference_rssi")
+
+    _FIELDS = (
+        ("eid", None),
+        ("reference_rssi", "b"),
+    )
+
+    _RAW_OFFSET = 4  # After the service UUID list
+    _RAW_TYPE = (
+        (1, _EDDYSTONE_SERVICE_DATA),
+        (2, _EDDYSTONE_UUID & 0xFF),
+        (3, _EDDYSTONE_UUID >> 8),
+        (4, _EDDYSTONE_FRAME_TYPE_EID),
+    )
 
-        # Join the URL together
-        url += _URL_SCHEME[adv_data[6]]
-        url += adv_data[7 : frame_length + 1]
+    # The reference RSSI is measured at 0m
+    _REFERENCE_LOSS_1M = 41
 
-        # Replace TLD ID if any
-        for byte in url:
-            if byte <= 13:
-                url = url.replace(bytes([byte]), _URL_TLD[byte])
+    # The beacon data is in the service data of the frame
+    _AD_TYPE = _EDDYSTONE_SERVICE_DATA
+
+    def __init__(self, *, adv_data=None, offset=0):
+        super().__init__()
+
+        # If adv_data is provided, decode it to initialize the beacon
+        if adv_data:
+            self.decode(adv_data, offset)
+        else:
+            raise ValueError("Could not initialize beacon")
+
+    @ubeaconDecorators.remove_adv_header
+    def decode(self, adv_data, offset=0):
+        """
+        Decode the received advertising data and set the corresponding attributes
+        """
+        if (
+            adv_data[offset] != _EDDYSTONE_FRAME_LENGTH_EID
+            or len(adv_data) <= offset + _EDDYSTONE_FRAME_LENGTH_EID
+        ):
+            raise ValueError("Invalid size.")
+
+        self.reference_rssi = unpack_from(">b", adv_data, offset + 5)[0]
+        self.eid = hexlify(adv_data[offset + 6 : offset + 14]).decode()
+
+
+class EddystoneDevice:
+    """Latest frame of each type received from an Eddystone beacon"""
+
+    __slots__ = ("uid", "url", "eid", "tlm")
+
+    def __init__(self):
+        self.uid = None
+        self.url = None
+        self.eid = None
+        self.tlm = None
+
+    def __repr__(self):
+        return "EddystoneDevice(uid={!r}, url={!r}, eid={!r}, tlm={!r})".format(
+            self.uid, self.url, self.eid, self.tlm
+        )
+
+
+class EddystoneAggregator:
+    """
+    Correlate the interleaved frames of Eddystone beacons by device address,
+    i.e. the telemetry with the UID of the beacon. Keeps the frames of at
+    most maxsize devices, the least recently seen device is evicted first.
+    """
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self._devices = OrderedDict()  # addr -> EddystoneDevice
+
+    def __len__(self):
+        return len(self._devices)
+
+    def get(self, addr):
+        """Return the EddystoneDevice of the address or None"""
+        return self._devices.get(addr)
+
+    def update(self, addr, beacon):
+        """
+        Store the Eddystone frame of the device with the address and return
+        its EddystoneDevice. Other beacons are ignored and return None.
+        """
+        if isinstance(beacon, EddystoneTLM):
+            attr = "tlm"
+        elif isinstance(beacon, EddystoneUID):
+            attr = "uid"
+        elif isinstance(beacon, EddystoneURL):
+            attr = "url"
+        elif isinstance(beacon, EddystoneEID):
+            attr = "eid"
+        else:
+            return None
 
-        self.url = url.decode()
-        self.reference_rssi = unpack(">b", bytes([adv_data[5]]))[0]
+        if not isinstance(addr, bytes):
+            addr = bytes(addr)
+        devices = self._devices
+        device = devices.pop(addr, None)
+        if device is None:
+            device = EddystoneDevice()
+            if len(devices) >= self.maxsize:
+                del devices[next(iter(devices))]
+        devices[addr] = device  # Most recently seen
+        setattr(device, attr, beacon)
+        return device
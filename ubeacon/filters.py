@@ -0,0 +1,287 @@
+"""
+Compiled beacon filters to match beacons against many filters at once
+"""
+
+from binascii import hexlify, unhexlify
+
+from . import Beacon, FLAGS_LENGTH, FLAGS_TYPE, const, find_decoder
+
+
+# Size of the Eddystone namespace in hex digits
+_NAMESPACE_DIGITS = const(20)
+
+
+def _values(value, convert):
+    """Convert a single value or a list or tuple of values into a list"""
+    if isinstance(value, (list, tuple)):
+        return [convert(v) for v in value]
+    return [convert(value)]
+
+
+def _hex(value):
+    """Validate and lowercase a hex string, which may have an odd number of digits"""
+    unhexlify(value + "0" if len(value) & 1 else value)
+    return value.lower()
+
+
+def _range(value):
+    """Convert a single value or a list or tuple of values into a container"""
+    if value is None or isinstance(value, range):
+        return value
+    if isinstance(value, (list, tuple)):
+        return set(value)
+    return range(value, value + 1)
+
+
+def _raw_bytes(adv_data, offset, end, field):
+    """Read a raw field as bytes if it is within the ADV data structure"""
+    if field is not None:
+        start = offset + field[0]
+        if start + field[1] <= end:
+            return bytes(adv_data[start : start + field[1]])
+    return None
+
+
+def _raw_int(adv_data, offset, end, field):
+    """Read a raw 2-byte big endian field if it is within the ADV data structure"""
+    if field is not None:
+        start = offset + field[0]
+        if start + 2 <= end:
+            return adv_data[start] << 8 | adv_data[start + 1]
+    return None
+
+
+def _match_triples(triples, adv_data, offset):
+    """Check the (offset, mask, value) triples at the offset"""
+    for i in range(0, len(triples), 3):
+        if adv_data[offset + triples[i]] & triples[i + 1] != triples[i + 2]:
+            return False
+    return True
+
+
+def _range_mask(value):
+    """
+    Return the (mask, value) of a range which can be expressed as bit mask,
+    i.e. range(0x0100, 0x0200), or None
+    """
+    size = len(value)
+    if (
+        value.step != 1
+        or size == 0
+        or size & (size - 1)  # Not a power of two
+        or value.start & (size - 1)  # Not aligned to its size
+    ):
+        return None
+    return ~(size - 1) & 0xFFFF, value.start
+
+
+class BytePattern:
+    """
+    Byte pattern compiled from a BeaconFilter for one beacon class. It checks
+    (offset, mask, value) triples against the ADV data structure of the beacon
+    to reject non matching beacons before they are decoded. Lists and ranges
+    which can not be expressed as bit mask are not part of the pattern; if
+    complete is False a match has to be confirmed with BeaconFilter.match on
+    the decoded beacon.
+    """
+
+    def __init__(self, beacon_filter, beacon_class):
+        self.complete = True
+        self._beacon_class = beacon_class
+        self._offset = beacon_class._RAW_OFFSET
+
+        triples = []
+        for offset, value in beacon_class._RAW_TYPE:
+            triples += (offset, 0xFF, value)
+        self._fields_start = len(triples)
+
+        fields = beacon_class._RAW_FIELDS
+        for key, value in beacon_filter.properties.items():
+            field = fields.get("namespace" if key == "namespace_prefix" else key)
+            if field is None:
+                raise ValueError("Filter type not supported by beacon")
+
+            offset, size = field
+            if isinstance(value, range):
+                mask = _range_mask(value)
+                if mask is None:
+                    self.complete = False
+                    continue
+                mask, value = mask
+                triples += (offset, mask >> 8, value >> 8)
+                triples += (offset + 1, mask & 0xFF, value & 0xFF)
+            elif isinstance(value, (list, tuple)):
+                self.complete = False
+            else:
+                if key == "uuid":
+                    value = Beacon.uuid_to_bin(value)
+                elif isinstance(value, int):
+                    value = value.to_bytes(size, "big")
+                elif len(value) & 1:
+                    # Prefix with an odd number of hex digits, match the high
+                    # nibble of the last byte
+                    last = int(value[-1], 16) << 4
+                    value = unhexlify(value[:-1])
+                    triples += (offset + len(value), 0xF0, last)
+                else:
+                    value = unhexlify(value)
+                for i, byte in enumerate(value):
+                    triples += (offset + i, 0xFF, byte)
+
+        self._triples = tuple(triples)
+        self._size = max(triples[::3]) + 1
+
+    def match(self, adv_data):
+        """Check if the advertising data matches the pattern"""
+        triples = self._triples
+        fields_start = self._fields_start
+
+        # Try the offset the beacon is encoded at first, the beacon type bytes
+        # show if its ADV data structure is there
+        offset = self._offset
+        if (
+            len(adv_data) > 1
+            and adv_data[0] == FLAGS_LENGTH
+            and adv_data[1] == FLAGS_TYPE
+        ):
+            offset += FLAGS_LENGTH + 1
+        if len(adv_data) >= offset + self._size:
+            for i in range(0, len(triples), 3):
+                if adv_data[offset + triples[i]] & triples[i + 1] != triples[i + 2]:
+                    if i < fields_start:
+                        break  # Not at the offset, search it below
+                    return False
+            else:
+                return True
+
+        # Locate the ADV data structure like decode()
+        beacon_class, found = find_decoder(adv_data)
+        if (
+            beacon_class is not self._beacon_class
+            or found == offset
+            or adv_data[found] + 1 < self._size
+        ):
+            return False
+        return _match_triples(triples, adv_data, found)
+
+
+class FilterIndex:
+    """
+    Set of beacon filters compiled into hash indexes on the UUID and the
+    Eddystone namespace (prefix). Each filter is added with a key, i.e. a
+    tenant ID, and the keys of all matching filters are returned.
+    """
+
+    def __init__(self):
+        self._uuids = {}
+        self._namespaces = {}  # Prefix length in hex digits -> {prefix: filters}
+        self._unindexed = []
+
+    def add(self, key, beacon_filter):
+        """Compile and add a BeaconFilter identified by key"""
+        properties = beacon_filter.properties
+
+        instances = properties.get("instance")
+        if instances is not None:
+            instances = set(_values(instances, unhexlify))
+
+        entry = (
+            key,
+            _range(properties.get("major")),
+            _range(properties.get("minor")),
+            instances,
+        )
+
+        if "uuid" in properties:
+            for uuid in _values(properties["uuid"], Beacon.uuid_to_bin):
+                self._uuids.setdefault(uuid, []).append(entry)
+        elif "namespace" in properties or "namespace_prefix" in properties:
+            prefix = properties.get("namespace_prefix")
+            if prefix is not None:
+                prefix = _hex(prefix)
+            if "namespace" in properties:
+                # Both have to match, only index the namespaces with the prefix
+                prefixes = [
+                    namespace
+                    for namespace in _values(properties["namespace"], _hex)
+                    if prefix is None or namespace.startswith(prefix)
+                ]
+            else:
+                prefixes = [prefix]
+            for prefix in prefixes:
+                namespaces = self._namespaces.setdefault(len(prefix), {})
+                namespaces.setdefault(prefix, []).append(entry)
+        else:
+            self._unindexed.append(entry)
+
+    def _match(self, uuid, namespace, instance, major, minor):
+        """
+        Return the keys of all filters matching the beacon IDs, with the
+        namespace as hex string
+        """
+        candidates = self._unindexed
+        if uuid is not None:
+            candidates = candidates + self._uuids.get(uuid, [])
+        elif namespace is not None:
+            for length, namespaces in self._namespaces.items():
+                prefix = (
+                    namespace if length == _NAMESPACE_DIGITS else namespace[:length]
+                )
+                if prefix in namespaces:
+                    candidates = candidates + namespaces[prefix]
+
+        keys = []
+        for key, majors, minors, instances in candidates:
+            if majors is not None and (major is None or major not in majors):
+                continue
+            if minors is not None and (minor is None or minor not in minors):
+                continue
+            if instances is not None and instance not in instances:
+                continue
+            keys.append(key)
+        return keys
+
+    def match(self, beacon):
+        """Return the keys of all filters matching the beacon object"""
+        uuid = getattr(beacon, "uuid", None)
+        if uuid is not None:
+            uuid = Beacon.uuid_to_bin(uuid)
+
+        namespace = getattr(beacon, "namespace", None)
+        instance = None
+        if namespace is not None:
+            namespace = namespace.lower()
+            instance = unhexlify(beacon.instance)
+
+        return self._match(
+            uuid,
+            namespace,
+            instance,
+            getattr(beacon, "major", None),
+            getattr(beacon, "minor", None),
+        )
+
+    def match_adv(self, adv_data):
+        """
+        Return the keys of all filters matching the advertising data without
+        decoding it into a beacon object
+        """
+        beacon_class, offset = find_decoder(adv_data)
+        if beacon_class is None:
+            return []
+
+        # End of the beacon ADV data structure
+        end = min(offset + adv_data[offset] + 1, len(adv_data))
+        fields = beacon_class._RAW_FIELDS
+
+        namespace = _raw_bytes(adv_data, offset, end, fields.get("namespace"))
+        if namespace is not None:
+            namespace = hexlify(namespace).decode()
+
+        return self._match(
+            _raw_bytes(adv_data, offset, end, fields.get("uuid")),
+            namespace,
+            _raw_bytes(adv_data, offset, end, fields.get("instance")),
+            _raw_int(adv_data, offset, end, fields.get("major")),
+            _raw_int(adv_data, offset, end, fields.get("minor")),
+        )
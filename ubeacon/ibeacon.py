@@ -2,7 +2,7 @@
 iBeacon Protocol Specification: https://developer.apple.com/ibeacon/
 """
 
-from struct import pack, unpack
+from struct import pack, pack_into, unpack_from
 
 from . import (
     UUID,
@@ -11,6 +11,8 @@ from . import (
     FLAGS_TYPE,
     FLAGS_DATA,
     ADV_TYPE_MFG_DATA,
+    adv_field,
+    const,
     ubeaconDecorators,
 )
 
@@ -27,8 +29,41 @@ _ADV_LENGTH = const(0x1A)
 # Value representing the average received signal strength at 1m from the advertiser
 _REFERENCE_RSSI = const(-70)
 
+# Size of the advertising data including the flags
+_ADV_SIZE = const(30)
+
+# Advertising data up to the proximity UUID
+_ADV_HEADER = (
+    bytes((FLAGS_LENGTH, FLAGS_TYPE, FLAGS_DATA, _ADV_LENGTH, ADV_TYPE_MFG_DATA))
+    + pack("<H", _COMPANY_ID)
+    + pack(">H", _DEVICE_TYPE)
+)
+
 
 class IBeacon(Beacon):
+    __slots__ = ("_uuid", "_major", "_minor", "_reference_rssi")
+
+    _FIELDS = (
+        ("uuid", None),
+        ("major", "H"),
+        ("minor", "H"),
+        ("reference_rssi", "b"),
+    )
+
+    _RAW_FIELDS = {"uuid": (6, 16), "major": (22, 2), "minor": (24, 2)}
+    _RAW_TYPE = (
+        (1, ADV_TYPE_MFG_DATA),
+        (2, _COMPANY_ID & 0xFF),
+        (3, _COMPANY_ID >> 8),
+        (4, _DEVICE_TYPE >> 8),
+        (5, _DEVICE_TYPE & 0xFF),
+    )
+
+    uuid = adv_field("uuid")
+    major = adv_field("major", 25, ">H")
+    minor = adv_field("minor", 27, ">H")
+    reference_rssi = adv_field("reference_rssi", 29, ">b")
+
     def __init__(
         self,
         uuid=None,  # c9ae8912-0c99-471d-ac77-d013f4956c33
@@ -36,11 +71,14 @@ class IBeacon(Beacon):
         minor=None,  # 0 - 65535
         reference_rssi=_REFERENCE_RSSI,  # 1-byte
         *,
-        adv_data=None
+        adv_data=None,
+        offset=0,
     ):
+        super().__init__()
+
         # If adv_data is provided, decode it to initialize the beacon
         if adv_data:
-            self.decode(adv_data)
+            self.decode(adv_data, offset)
         # If uuid, major and minor are provided, use them to initialize the beacon
         elif uuid and major and minor:
             self.uuid = uuid
@@ -51,36 +89,25 @@ class IBeacon(Beacon):
             # If neither adv_data nor required values are provided, raise an error
             raise ValueError("Could not initialize beacon")
 
-    @property
-    def adv(self):
-        """Generate the advertising data for the iBeacon"""
-        return (
-            [
-                FLAGS_LENGTH,
-                FLAGS_TYPE,
-                FLAGS_DATA,
-                _ADV_LENGTH,
-                ADV_TYPE_MFG_DATA,
-            ]
-            + [x for x in pack("<H", _COMPANY_ID)]
-            + [x for x in pack(">H", _DEVICE_TYPE)]
-            + [x for x in self.validate(self.uuid_to_bin(self.uuid), 16)]
-            + [x for x in self.validate(pack(">H", self.major), 2)]
-            + [x for x in self.validate(pack(">H", self.minor), 2)]
-            + [
-                self.validate(pack(">b", self.reference_rssi), 1)[0],
-            ]
-        )
+    def encode(self, adv=None):
+        """Encode the advertising data for the iBeacon"""
+        if adv is None:
+            adv = bytearray(_ADV_SIZE)
+            adv[:9] = _ADV_HEADER
+
+        adv[9:25] = self.validate(self.uuid_to_bin(self.uuid), 16)
+        pack_into(">HHb", adv, 25, self.major, self.minor, self.reference_rssi)
+        return adv
 
     @ubeaconDecorators.remove_adv_header
-    def decode(self, adv_data):
+    def decode(self, adv_data, offset=0):
         """
         Decode the received advertising data and set the corresponding attributes
         """
-        if len(adv_data[1:]) != _ADV_LENGTH:
+        if adv_data[offset] != _ADV_LENGTH or len(adv_data) <= offset + _ADV_LENGTH:
             raise ValueError("Invalid size")
 
-        self.uuid = str(UUID(adv_data[6:22]))
-        self.major = unpack(">H", adv_data[22:24])[0]
-        self.minor = unpack(">H", adv_data[24:26])[0]
-        self.reference_rssi = unpack(">b", bytes([adv_data[26]]))[0]
+        self.uuid = UUID(bytes(adv_data[offset + 6 : offset + 22]))
+        self.major, self.minor, self.reference_rssi = unpack_from(
+            ">HHb", adv_data, offset + 22
+        )
@@ -2,7 +2,7 @@
 LinTech Beacon Protocol Specification: https://www.lintech.de/support/downloads/bluetooth-low-energy-smart-beacon/
 """
 
-from struct import pack, unpack
+from struct import pack, pack_into, unpack_from
 
 from . import (
     UUID,
@@ -11,6 +11,8 @@ from . import (
     FLAGS_TYPE,
     FLAGS_DATA,
     ADV_TYPE_MFG_DATA,
+    adv_field,
+    const,
     ubeaconDecorators,
 )
 
@@ -33,8 +35,50 @@ _PROXIMITY_UUID = "beff1020-2920-ff44-0103-ff4a400abfd7"
 # TX Power & Battery Level is, set to a fixed value for test only
 _TX_BAT_STATUS = const(0xFC)
 
+# Size of the advertising data including the flags
+_ADV_SIZE = const(31)
+
+# Advertising data up to the proximity UUID
+_ADV_HEADER = (
+    bytes((FLAGS_LENGTH, FLAGS_TYPE, FLAGS_DATA, _ADV_LENGTH, ADV_TYPE_MFG_DATA))
+    + pack("<H", _COMPANY_ID)
+    + pack(">H", _DEVICE_TYPE)
+)
+
 
 class LinTechBeacon(Beacon):
+    __slots__ = (
+        "_uuid",
+        "_major",
+        "_minor",
+        "_reference_rssi",
+        "tx_power",
+        "battery_level",
+    )
+
+    _FIELDS = (
+        ("uuid", None),
+        ("major", "H"),
+        ("minor", "H"),
+        ("reference_rssi", "b"),
+        ("tx_power", "B"),
+        ("battery_level", "B"),
+    )
+
+    _RAW_FIELDS = {"uuid": (6, 16), "major": (22, 2), "minor": (24, 2)}
+    _RAW_TYPE = (
+        (1, ADV_TYPE_MFG_DATA),
+        (2, _COMPANY_ID & 0xFF),
+        (3, _COMPANY_ID >> 8),
+        (4, _DEVICE_TYPE >> 8),
+        (5, _DEVICE_TYPE & 0xFF),
+    )
+
+    uuid = adv_field("uuid")
+    major = adv_field("major", 25, ">H")
+    minor = adv_field("minor", 27, ">H")
+    reference_rssi = adv_field("reference_rssi", 29, ">b")
+
     def __init__(
         self,
         uuid=_PROXIMITY_UUID,  # 16-bytes
@@ -43,53 +87,47 @@ class LinTechBeacon(Beacon):
         reference_rssi=_REFERENCE_RSSI,  # 1-byte
         *,
         adv_data=None,
+        offset=0,
     ):
+        super().__init__()
+
         # If adv_data is provided, decode it to initialize the beacon
         if adv_data:
-            self.decode(adv_data)
+            self.decode(adv_data, offset)
         # If major and minor are provided, use them to initialize the beacon
         elif major and minor:
             self.uuid = uuid
             self.major = major
             self.minor = minor
             self.reference_rssi = reference_rssi
+            self.tx_power = _TX_BAT_STATUS & 0b111
+            self.battery_level = _TX_BAT_STATUS >> 3
         else:
             # If neither adv_data nor required values are provided, raise an error
             raise ValueError("Could not initialize beacon")
 
-    @property
-    def adv(self):
-        """Generate the advertising data for the LinTech beacon"""
-        return (
-            [
-                FLAGS_LENGTH,
-                FLAGS_TYPE,
-                FLAGS_DATA,
-                _ADV_LENGTH,
-                ADV_TYPE_MFG_DATA,
-            ]
-            + [x for x in pack("<H", _COMPANY_ID)]
-            + [x for x in pack(">H", _DEVICE_TYPE)]
-            + [x for x in self.validate(self.uuid_to_bin(self.uuid), 16)]
-            + [x for x in self.validate(pack(">H", self.major), 2)]
-            + [x for x in self.validate(pack(">H", self.minor), 2)]
-            + [
-                self.validate(pack(">b", self.reference_rssi), 1)[0],
-                _TX_BAT_STATUS,
-            ]
-        )
+    def encode(self, adv=None):
+        """Encode the advertising data for the LinTech beacon"""
+        if adv is None:
+            adv = bytearray(_ADV_SIZE)
+            adv[:9] = _ADV_HEADER
+            adv[30] = _TX_BAT_STATUS
+
+        adv[9:25] = self.validate(self.uuid_to_bin(self.uuid), 16)
+        pack_into(">HHb", adv, 25, self.major, self.minor, self.reference_rssi)
+        return adv
 
     @ubeaconDecorators.remove_adv_header
-    def decode(self, adv_data):
+    def decode(self, adv_data, offset=0):
         """
         Decode the received advertising data and set the corresponding attributes
         """
-        if len(adv_data[1:]) != _ADV_LENGTH:
+        if adv_data[offset] != _ADV_LENGTH or len(adv_data) <= offset + _ADV_LENGTH:
             raise ValueError("Invalid size")
 
-        self.uuid = str(UUID(adv_data[6:22]))
-        self.major = unpack(">H", adv_data[22:24])[0]
-        self.minor = unpack(">H", adv_data[24:26])[0]
-        self.reference_rssi = unpack(">b", bytes([adv_data[26]]))[0]
-        self.tx_power = adv_data[27] & 0b111
-        self.battery_level = adv_data[27] >> 3
+        self.uuid = UUID(bytes(adv_data[offset + 6 : offset + 22]))
+        self.major, self.minor, self.reference_rssi = unpack_from(
+            ">HHb", adv_data, offset + 22
+        )
+        self.tx_power = adv_data[offset + 27] & 0b111
+        self.battery_level = adv_data[offset + 27] >> 3
@@ -4,9 +4,9 @@ MikroTik Protocol Specification
 https://help.mikrotik.com/docs/display/UM/MikroTik+Tag+advertisement+formats
 """
 
-from struct import unpack
+from struct import unpack_from
 
-from . import Beacon, ubeaconDecorators
+from . import Beacon, const, ubeaconDecorators
 
 
 # Length of the data frame from the manufacturer specific ADV data structure.
@@ -14,35 +14,67 @@ _ADV_LENGTH = const(0x15)
 
 
 class MikroTik(Beacon):
-    def __init__(self, *, adv_data=None):
-        self.temperature = None
+    __slots__ = (
+        "version",
+        "encrypted",
+        "salt",
+        "acceleration_x",
+        "acceleration_y",
+        "acceleration_z",
+        "temperature",
+        "uptime",
+        "trigger",
+        "battery",
+    )
+
+    _FIELDS = (
+        ("version", "B"),
+        ("encrypted", "B"),
+        ("salt", "H"),
+        ("acceleration_x", "f"),
+        ("acceleration_y", "f"),
+        ("acceleration_z", "f"),
+        ("temperature", "f"),
+        ("uptime", "I"),
+        ("trigger", "B"),
+        ("battery", "B"),
+    )
+
+    def __init__(self, *, adv_data=None, offset=0):
+        super().__init__()
 
         # If adv_data is provided, decode it to initialize the beacon
         if adv_data:
-            self.decode(adv_data)
+            self.decode(adv_data, offset)
         else:
             # If no adv_data, raise an error
             raise ValueError("Could not initialize beacon")
 
     @ubeaconDecorators.remove_adv_header
-    def decode(self, adv_data):
+    def decode(self, adv_data, offset=0):
         """
         Decode the received advertising data and set the corresponding attributes
         """
-        if len(adv_data[1:]) != _ADV_LENGTH:
+        if adv_data[offset] != _ADV_LENGTH or len(adv_data) <= offset + _ADV_LENGTH:
             raise ValueError("Invalid size")
 
-        self.version = adv_data[4]
-        self.encrypted = bool(adv_data[5])
-        self.salt = unpack("<H", adv_data[6:8])[0]
-        self.acceleration_x = unpack("<H", adv_data[8:10])[0] / 256
-        self.acceleration_y = unpack("<H", adv_data[10:12])[0] / 256
-        self.acceleration_z = unpack("<H", adv_data[12:14])[0] / 256
+        self.version = adv_data[offset + 4]
+        self.encrypted = bool(adv_data[offset + 5])
+        (
+            self.salt,
+            acceleration_x,
+            acceleration_y,
+            acceleration_z,
+            temperature,
+            self.uptime,
+            self.trigger,
+            self.battery,
+        ) = unpack_from("<HHHHhIBB", adv_data, offset + 6)
 
-        temperature = unpack("<h", adv_data[14:16])[0] / 256
-        if temperature != -128.0:
-            self.temperature = temperature
+        self.acceleration_x = acceleration_x / 256
+        self.acceleration_y = acceleration_y / 256
+        self.acceleration_z = acceleration_z / 256
 
-        self.uptime = unpack("<I", adv_data[16:20])[0]
-        self.trigger = adv_data[20]
-        self.battery = adv_data[21]
+        # Temperature is not supported by the tag
+        temperature = temperature / 256
+        self.temperature = None if temperature == -128.0 else temperature
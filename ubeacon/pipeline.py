@@ -0,0 +1,118 @@
+"""
+Streaming pipeline to decode, filter and deduplicate scan results
+"""
+
+from . import decode
+
+
+class Sighting:
+    """Advertising data received from a device and the decoded beacon"""
+
+    __slots__ = ("addr", "rssi", "adv_data", "beacon")
+
+    def __init__(self, addr, rssi, adv_data, beacon=None):
+        self.addr = addr
+        self.rssi = rssi
+        self.adv_data = adv_data
+        self.beacon = beacon
+
+    def __repr__(self):
+        return "Sighting(addr={!r}, rssi={!r}, beacon={!r})".format(
+            self.addr, self.rssi, self.beacon
+        )
+
+    @classmethod
+    def from_scan_result(cls, result):
+        """Create a sighting from an aioble scan result"""
+        return cls(result.device.addr, result.rssi, result.adv_data)
+
+
+def decoded(cache=None):
+    """
+    Stage decoding the advertising data. Sightings of unknown beacons are
+    dropped. With a SightingCache, repeated advertising data is not decoded
+    again and, if the cache suppresses them, dropped.
+    """
+
+    def stage(sighting):
+        if cache is None:
+            sighting.beacon = decode(sighting.adv_data)
+        else:
+            sighting.beacon = cache.decode(sighting.addr, sighting.adv_data)
+        return sighting if sighting.beacon is not None else None
+
+    return stage
+
+
+def matching_adv(pattern):
+    """
+    Stage dropping sightings whose advertising data does not match, i.e. a
+    BytePattern. Use it before decoded to skip decoding other beacons.
+    """
+
+    def stage(sighting):
+        return sighting if pattern.match(sighting.adv_data) else None
+
+    return stage
+
+
+def matching(beacon_filter):
+    """Stage dropping sightings whose decoded beacon does not match the filter"""
+
+    def stage(sighting):
+        return sighting if beacon_filter.match(sighting.beacon) else None
+
+    return stage
+
+
+def fanout(*consumers):
+    """Stage passing each sighting to all consumers without decoding it again"""
+
+    def stage(sighting):
+        for consumer in consumers:
+            consumer(sighting)
+        return sighting
+
+    return stage
+
+
+def process(stages, item):
+    """Pass the item through the stages, returns None if it was dropped"""
+    for stage in stages:
+        item = stage(item)
+        if item is None:
+            break
+    return item
+
+
+def pipeline(source, *stages):
+    """
+    Generator passing each item of the source through the stages. A stage is
+    a callable returning the item for the next stage or None to drop it.
+    """
+    for item in source:
+        item = process(stages, item)
+        if item is not None:
+            yield item
+
+
+class AsyncPipeline:
+    """
+    Asynchronous iterator passing each item of an asynchronous source, like
+    an aioble scanner, through the stages. Items are only read from the
+    source when the consumer asks for the next item.
+    """
+
+    def __init__(self, source, *stages):
+        self._source = source
+        self._stages = stages
+
+    def __aiter__(self):
+        self._iterator = self._source.__aiter__()
+        return self
+
+    async def __anext__(self):
+        while True:
+            item = process(self._stages, await self._iterator.__anext__())
+            if item is not None:
+                return item
@@ -0,0 +1,191 @@
+"""
+Decode capture files across processes on CPython
+
+    python -m ubeacon.replay [--binary] [--workers N] [-o output.json] capture
+
+Captures in the ubeacon.capture format are detected by their header, other
+files are read as hex lines or, with --binary, length prefixed data.
+"""
+
+import argparse
+import json
+import os
+import sys
+from binascii import unhexlify
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from . import decode_batch
+from .capture import MAGIC, CaptureReader
+
+
+def read_hex(path):
+    """Read one hex encoded advertisement per line, skipping empty lines"""
+    with open(path, "rb") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield unhexlify(line)
+
+
+def read_binary(path):
+    """Read advertisements prefixed with their length as one byte"""
+    with open(path, "rb") as f:
+        data = f.read()
+    offset = 0
+    while offset < len(data):
+        length = data[offset]
+        offset += 1
+        yield data[offset : offset + length]
+        offset += length
+
+
+def chunked(payloads, size):
+    """Group advertisements into lists of the given size"""
+    chunk = []
+    for adv_data in payloads:
+        chunk.append(adv_data)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def merge(total, batch):
+    """Append the columns of a decode_batch result to the total"""
+    for beacon_class, columns in batch.items():
+        if beacon_class not in total:
+            total[beacon_class] = columns
+            continue
+
+        merged = total[beacon_class]
+        for name, typecode in beacon_class._FIELDS:
+            if typecode is None:
+                values = merged[name]
+                indexes = {value: index for index, value in enumerate(values)}
+                remap = []
+                for value in columns[name]:
+                    index = indexes.get(value)
+                    if index is None:
+                        index = indexes[value] = len(values)
+                        values.append(value)
+                    remap.append(index)
+                merged[name + "_index"].extend(
+                    remap[index] for index in columns[name + "_index"]
+                )
+            else:
+                merged[name].extend(columns[name])
+        for name in beacon_class._OPTIONAL_FIELDS:
+            merged["has_" + name].extend(columns["has_" + name])
+    return total
+
+
+def _collect(jobs, workers):
+    """
+    Run the (function, *args) jobs across worker processes and merge the
+    results in order. At most two jobs per worker are queued, so large
+    captures are not read into memory at once.
+    """
+    workers = workers or os.cpu_count() or 1
+    total = {}
+    with ProcessPoolExecutor(workers) as executor:
+        pending = deque()
+        for job in jobs:
+            pending.append(executor.submit(*job))
+            if len(pending) >= 2 * workers:
+                merge(total, pending.popleft().result())
+        while pending:
+            merge(total, pending.popleft().result())
+    return total
+
+
+def replay(payloads, workers=None, chunksize=4096):
+    """
+    Decode the advertisements in chunks of chunksize across worker processes
+    and merge the columns in input order into one dict like decode_batch.
+    """
+    jobs = ((decode_batch, chunk) for chunk in chunked(payloads, chunksize))
+    return _collect(jobs, workers)
+
+
+def decode_capture(path, start, end):
+    """Decode the records between the offsets of a memory mapped capture"""
+    with CaptureReader(path) as capture:
+        return decode_batch([record[3] for record in capture.records(start, end)])
+
+
+def replay_capture(path, workers=None, chunksize=4096):
+    """
+    Like replay for a capture file. Only the record offsets are passed to
+    the worker processes, which map the file and decode without copying.
+    """
+    with CaptureReader(path) as capture:
+        ranges = list(capture.ranges(chunksize))
+    jobs = ((decode_capture, path, start, end) for start, end in ranges)
+    return _collect(jobs, workers)
+
+
+def is_capture(path):
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def count(beacon_class, columns):
+    """Number of decoded advertisements in the columns"""
+    name, typecode = beacon_class._FIELDS[0]
+    return len(columns[name if typecode is not None else name + "_index"])
+
+
+def to_json(total):
+    """Convert merged columns to JSON data keyed on the beacon class name"""
+    data = {}
+    for beacon_class, columns in total.items():
+        rows = data[beacon_class.__name__] = {}
+        for name, typecode in beacon_class._FIELDS:
+            values = columns[name]
+            if typecode is None:
+                indexes = columns[name + "_index"]
+                rows[name] = [str(values[index]) for index in indexes]
+            elif name in beacon_class._OPTIONAL_FIELDS:
+                available = columns["has_" + name]
+                rows[name] = [
+                    value if has else None for value, has in zip(values, available)
+                ]
+            else:
+                rows[name] = list(values)
+    return data
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m ubeacon.replay",
+        description="Decode a capture file of BLE advertisements",
+    )
+    parser.add_argument("capture", help="capture file with advertisements")
+    parser.add_argument(
+        "--binary",
+        action="store_true",
+        help="length prefixed advertisements instead of hex lines",
+    )
+    parser.add_argument("--workers", type=int, help="number of processes")
+    parser.add_argument("--chunksize", type=int, default=4096)
+    parser.add_argument("-o", "--output", help="write the columns as JSON")
+    args = parser.parse_args(argv)
+
+    if is_capture(args.capture):
+        total = replay_capture(args.capture, args.workers, args.chunksize)
+    else:
+        reader = read_binary if args.binary else read_hex
+        total = replay(reader(args.capture), args.workers, args.chunksize)
+
+    for beacon_class, columns in total.items():
+        print(f"{beacon_class.__name__}: {count(beacon_class, columns)}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(to_json(total), f)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
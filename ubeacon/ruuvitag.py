@@ -2,67 +2,241 @@
 RuuviTag Protocol Specification: https://docs.ruuvi.com/communication/bluetooth-advertisements
 """
 
-from struct import unpack
+from array import array
+from struct import unpack_from
 
-from . import Beacon, ubeaconDecorators
+from . import Beacon, const, ubeaconDecorators
 
 
 _DATA_FORMAT_3 = const(0x03)
 _DATA_FORMAT_5 = const(0x05)
-_RUUVITAG_ADV = b"\x99\x04"
+_RUUVITAG_COMPANY_ID = const(0x0499)
+
+# Struct formats and payload sizes including the data format byte
+_FORMAT_3 = ">BBBBHhhhH"
+_FORMAT_3_SIZE = const(14)
+_FORMAT_5 = ">BhHHhhhHBH"
+_FORMAT_5_SIZE = const(24)  # Including the 6-byte MAC address
+
+
+def _temperature_format_3(value, fraction):
+    """Convert the sign and magnitude temperature of data format 3"""
+    temperature = value + fraction / 100
+    if temperature > 128:
+        temperature -= 128
+        temperature = round(0 - temperature, 2)
+    return temperature
+
+
+def _humidity_format_3(value):
+    """Convert the humidity of data format 3 in 0.5% steps"""
+    return value / 2
+
+
+def _temperature_format_5(value):
+    """Convert the temperature of data format 5 in 0.005 degree steps"""
+    return value * 0.005
+
+
+def _humidity_format_5(value):
+    """Convert the humidity of data format 5 in 0.0025% steps"""
+    return value * 0.0025
+
+
+def _pressure(value):
+    """Convert the pressure with an offset of 50000 Pa"""
+    return value + 50000
+
+
+def _battery_voltage_format_5(power):
+    """Convert the upper 11 bits of the power info to mV above 1.6V"""
+    return (power >> 5) + 1600
+
+
+def _tx_power_format_5(power):
+    """Convert the lower 5 bits of the power info to dBm above -40dBm"""
+    return (power & 0x1F) * 2 - 40
 
 
 class RuuviTag(Beacon):
-    def __init__(self, *, adv_data):
-        self.decode(adv_data)
+    __slots__ = (
+        "data_format",
+        "temperature",
+        "humidity",
+        "pressure",
+        "acceleration_x",
+        "acceleration_y",
+        "acceleration_z",
+        "battery_voltage",
+        "tx_power",
+        "movement_counter",
+        "measurement_sequence",
+    )
+
+    _FIELDS = (
+        ("data_format", "B"),
+        ("temperature", "f"),
+        ("humidity", "f"),
+        ("pressure", "I"),
+        ("acceleration_x", "h"),
+        ("acceleration_y", "h"),
+        ("acceleration_z", "h"),
+        ("battery_voltage", "H"),
+        ("tx_power", "b"),
+        ("movement_counter", "B"),
+        ("measurement_sequence", "H"),
+    )
+
+    # Not available in data format 3
+    _OPTIONAL_FIELDS = ("tx_power", "movement_counter", "measurement_sequence")
+
+    def __init__(self, *, adv_data, offset=0):
+        super().__init__()
+        self.decode(adv_data, offset)
 
     @ubeaconDecorators.remove_adv_header
-    def decode(self, adv_data):
-        # Strip advertisement data
-        if _RUUVITAG_ADV in adv_data[:4]:
-            adv_data = adv_data[4:]
+    def decode(self, adv_data, offset=0):
+        # Skip the manufacturer specific data header
+        if (
+            len(adv_data) > offset + 4
+            and adv_data[offset + 2] | adv_data[offset + 3] << 8
+            == _RUUVITAG_COMPANY_ID
+        ):
+            offset += 4
 
-        data_format = adv_data[0]  # RuuviTag data format
+        data_format = adv_data[offset]  # RuuviTag data format
 
         if data_format == _DATA_FORMAT_3:
-            self.decode_data_format_3(adv_data)
+            self.decode_data_format_3(adv_data, offset)
         elif data_format == _DATA_FORMAT_5:
-            self.decode_data_format_5(adv_data)
+            self.decode_data_format_5(adv_data, offset)
+        else:
+            raise ValueError("Unknown data format")
 
-    def decode_data_format_3(self, adv_data):
+    def decode_data_format_3(self, adv_data, offset=0):
         """Data format 3 (RAWv1)"""
-        self.data_format = _DATA_FORMAT_3
-
-        self.humidity = adv_data[1] / 2
-
-        temperature = adv_data[2] + adv_data[3] / 100
-        if temperature > 128:
-            temperature -= 128
-            temperature = round(0 - temperature, 2)
-        self.temperature = temperature
+        if len(adv_data) < offset + _FORMAT_3_SIZE:
+            raise ValueError("Invalid size")
 
-        self.pressure = unpack(">H", adv_data[4:6])[0] + 50000
-
-        self.acceleration_x = unpack(">h", adv_data[6:8])[0]
-        self.acceleration_y = unpack(">h", adv_data[8:10])[0]
-        self.acceleration_z = unpack(">h", adv_data[10:12])[0]
-        self.battery_voltage = unpack(">H", adv_data[12:14])[0]
+        self.data_format = _DATA_FORMAT_3
 
-    def decode_data_format_5(self, adv_data):
+        (
+            _,
+            humidity,
+            temperature,
+            fraction,
+            pressure,
+            self.acceleration_x,
+            self.acceleration_y,
+            self.acceleration_z,
+            self.battery_voltage,
+        ) = unpack_from(_FORMAT_3, adv_data, offset)
+
+        self.humidity = _humidity_format_3(humidity)
+        self.temperature = _temperature_format_3(temperature, fraction)
+        self.pressure = _pressure(pressure)
+
+        # Not available in data format 3
+        self.tx_power = None
+        self.movement_counter = None
+        self.measurement_sequence = None
+
+    def decode_data_format_5(self, adv_data, offset=0):
         """Data format 5 (RAWv2)"""
-        self.data_format = _DATA_FORMAT_5
+        if len(adv_data) < offset + _FORMAT_5_SIZE:
+            raise ValueError("Invalid size")
 
-        self.temperature = unpack(">h", adv_data[1:3])[0] * 0.005
-        self.humidity = unpack(">H", adv_data[3:5])[0] * 0.0025
-        self.pressure = unpack(">H", adv_data[5:7])[0] + 50000
-
-        self.acceleration_x = unpack(">h", adv_data[7:9])[0]
-        self.acceleration_y = unpack(">h", adv_data[9:11])[0]
-        self.acceleration_z = unpack(">h", adv_data[11:13])[0]
-
-        power_bin = bin(unpack(">H", adv_data[13:15])[0])[2:]
-        self.battery_voltage = int(power_bin[:11], 2) + 1600
-        self.tx_power = int(power_bin[11:], 2) * 2 - 40
+        self.data_format = _DATA_FORMAT_5
 
-        self.movement_counter = adv_data[15]
-        self.measurement_sequence = unpack(">H", adv_data[16:18])[0]
+        (
+            _,
+            temperature,
+            humidity,
+            pressure,
+            self.acceleration_x,
+            self.acceleration_y,
+            self.acceleration_z,
+            power,
+            self.movement_counter,
+            self.measurement_sequence,
+        ) = unpack_from(_FORMAT_5, adv_data, offset)
+
+        self.temperature = _temperature_format_5(temperature)
+        self.humidity = _humidity_format_5(humidity)
+        self.pressure = _pressure(pressure)
+        self.battery_voltage = _battery_voltage_format_5(power)
+        self.tx_power = _tx_power_format_5(power)
+
+    @classmethod
+    def decode_buffer(cls, buffer):
+        """
+        Decode a contiguous buffer of data format 3 and 5 payloads, each
+        starting with the data format byte, into a dict of column arrays like
+        decode_many. Fields not available in data format 3 are stored as 0 and
+        marked as missing in their "has_<name>" column.
+        """
+        columns = {name: array(typecode) for name, typecode in cls._FIELDS}
+        for name in cls._OPTIONAL_FIELDS:
+            columns["has_" + name] = array("B")
+        data_format = columns["data_format"].append
+        temperature = columns["temperature"].append
+        humidity = columns["humidity"].append
+        pressure = columns["pressure"].append
+        acceleration_x = columns["acceleration_x"].append
+        acceleration_y = columns["acceleration_y"].append
+        acceleration_z = columns["acceleration_z"].append
+        battery_voltage = columns["battery_voltage"].append
+        tx_power = columns["tx_power"].append
+        movement_counter = columns["movement_counter"].append
+        measurement_sequence = columns["measurement_sequence"].append
+        has_tx_power = columns["has_tx_power"].append
+        has_movement_counter = columns["has_movement_counter"].append
+        has_measurement_sequence = columns["has_measurement_sequence"].append
+
+        offset = 0
+        size = len(buffer)
+        while offset < size:
+            if buffer[offset] == _DATA_FORMAT_5:
+                if offset + _FORMAT_5_SIZE > size:
+                    raise ValueError("Invalid size")
+                fields = unpack_from(_FORMAT_5, buffer, offset)
+                offset += _FORMAT_5_SIZE
+
+                data_format(_DATA_FORMAT_5)
+                temperature(_temperature_format_5(fields[1]))
+                humidity(_humidity_format_5(fields[2]))
+                pressure(_pressure(fields[3]))
+                acceleration_x(fields[4])
+                acceleration_y(fields[5])
+                acceleration_z(fields[6])
+                battery_voltage(_battery_voltage_format_5(fields[7]))
+                tx_power(_tx_power_format_5(fields[7]))
+                movement_counter(fields[8])
+                measurement_sequence(fields[9])
+                has_tx_power(1)
+                has_movement_counter(1)
+                has_measurement_sequence(1)
+            elif buffer[offset] == _DATA_FORMAT_3:
+                if offset + _FORMAT_3_SIZE > size:
+                    raise ValueError("Invalid size")
+                fields = unpack_from(_FORMAT_3, buffer, offset)
+                offset += _FORMAT_3_SIZE
+
+                data_format(_DATA_FORMAT_3)
+                humidity(_humidity_format_3(fields[1]))
+                temperature(_temperature_format_3(fields[2], fields[3]))
+                pressure(_pressure(fields[4]))
+                acceleration_x(fields[5])
+                acceleration_y(fields[6])
+                acceleration_z(fields[7])
+                battery_voltage(fields[8])
+                tx_power(0)
+                movement_counter(0)
+                measurement_sequence(0)
+                has_tx_power(0)
+                has_movement_counter(0)
+                has_measurement_sequence(0)
+            else:
+                raise ValueError("Unknown data format")
+
+        return columns
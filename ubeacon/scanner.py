@@ -0,0 +1,98 @@
+"""
+Scanner service decoupling BLE reception from decoding with a bounded queue
+"""
+
+from collections import OrderedDict
+
+from .pipeline import Sighting, decoded, process
+
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+
+
+class ScannerService:
+    """
+    Receive scan results into a bounded queue and decode them in a separate
+    task, so a slow consumer does not stall the scanner. The queue holds at
+    most one pending advertisement per device: newer advertising data of a
+    queued device replaces the older one (coalesced), and if the queue is
+    full the oldest advertisement is dropped. Each sighting is passed through
+    the stages, by default decoded(), and then awaited with the consumer.
+    Exceptions of the consumer are counted as failed and the last one is kept
+    in last_error, so they do not stop the processing of later sightings.
+    """
+
+    def __init__(self, consumer, *stages, maxsize=32):
+        self.consumer = consumer
+        self.maxsize = maxsize
+        self.stages = stages or (decoded(),)
+
+        # Counters
+        self.received = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.processed = 0
+        self.failed = 0
+        self.last_error = None
+
+        self._queue = OrderedDict()  # addr -> (rssi, adv_data)
+        self._event = asyncio.Event()
+        self._closed = False
+
+    def __len__(self):
+        return len(self._queue)
+
+    def put(self, addr, rssi, adv_data):
+        """Queue advertising data without blocking"""
+        self.received += 1
+        queue = self._queue
+        if addr in queue:
+            self.coalesced += 1
+            del queue[addr]  # Queue in order of the latest advertisement
+        elif len(queue) >= self.maxsize:
+            self.dropped += 1
+            del queue[next(iter(queue))]
+        queue[addr] = (rssi, adv_data)
+        self._event.set()
+
+    async def _process_queue(self):
+        """Pass queued advertisements through the stages to the consumer"""
+        queue = self._queue
+        while True:
+            if not queue:
+                if self._closed:
+                    return
+                await self._event.wait()
+                self._event.clear()
+                continue
+
+            addr = next(iter(queue))
+            rssi, adv_data = queue.pop(addr)
+            sighting = process(self.stages, Sighting(addr, rssi, adv_data))
+            if sighting is not None:
+                self.processed += 1
+                try:
+                    await self.consumer(sighting)
+                except Exception as error:
+                    self.failed += 1
+                    self.last_error = error
+
+            # Let the receiver run between advertisements
+            await asyncio.sleep(0)
+
+    async def run(self, scanner):
+        """
+        Receive scan results from the scanner, i.e. aioble.scan, until it
+        stops, then wait for the queued advertisements to be processed
+        """
+        self._closed = False
+        task = asyncio.create_task(self._process_queue())
+        try:
+            async for result in scanner:
+                self.put(result.device.addr, result.rssi, result.adv_data)
+        finally:
+            self._closed = True
+            self._event.set()
+        await task
@@ -0,0 +1,90 @@
+"""
+Decoding statistics for the instrumentation enabled with ubeacon.instrument
+"""
+
+import gc
+
+from . import ticks_diff, ticks_us
+
+try:
+    _mem_alloc = gc.mem_alloc
+except AttributeError:  # CPython
+    import tracemalloc
+
+    def _alloc_start():
+        if not tracemalloc.is_tracing():
+            return 0
+        tracemalloc.reset_peak()
+        return tracemalloc.get_traced_memory()[0]
+
+    def _alloc_stop(start):
+        if not tracemalloc.is_tracing():
+            return 0
+        return tracemalloc.get_traced_memory()[1] - start
+
+else:
+
+    def _alloc_start():
+        return _mem_alloc()
+
+    def _alloc_stop(start):
+        # A garbage collection during decoding frees more than was allocated
+        return max(_mem_alloc() - start, 0)
+
+
+class DecodeStats:
+    """
+    Count the classified packets per beacon class, with None for unknown
+    packets, and the decoded packets, time spent and bytes allocated per
+    beacon class. Failures are counted per (beacon class, reason). Bytes
+    allocated are counted with gc.mem_alloc on MicroPython and, if tracing
+    is started, as the tracemalloc peak on CPython.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.packets = {}
+        self.decoded = {}
+        self.time_us = {}
+        self.allocated = {}
+        self.failures = {}
+
+    def classified(self, beacon_class):
+        self.packets[beacon_class] = self.packets.get(beacon_class, 0) + 1
+
+    def start(self):
+        return ticks_us(), _alloc_start()
+
+    def stop(self, beacon_class, start):
+        ticks, alloc = start
+        elapsed = ticks_diff(ticks_us(), ticks)
+        allocated = _alloc_stop(alloc)
+        self.decoded[beacon_class] = self.decoded.get(beacon_class, 0) + 1
+        self.time_us[beacon_class] = self.time_us.get(beacon_class, 0) + elapsed
+        self.allocated[beacon_class] = self.allocated.get(beacon_class, 0) + allocated
+
+    def failed(self, beacon_class, error):
+        reason = error.args[0] if error.args else error.__class__.__name__
+        key = (beacon_class, reason)
+        self.failures[key] = self.failures.get(key, 0) + 1
+
+    def summary(self):
+        """Return the statistics as lines of text per beacon class"""
+        lines = []
+        for beacon_class, packets in self.packets.items():
+            name = "unknown" if beacon_class is None else beacon_class.__name__
+            decoded = self.decoded.get(beacon_class, 0)
+            line = "{}: {} packets, {} decoded".format(name, packets, decoded)
+            if decoded:
+                line += ", {} us/decode, {} B/decode".format(
+                    self.time_us[beacon_class] // decoded,
+                    self.allocated[beacon_class] // decoded,
+                )
+            lines.append(line)
+        for (beacon_class, reason), count in self.failures.items():
+            lines.append(
+                "{}: {} failed: {}".format(beacon_class.__name__, count, reason)
+            )
+        return "\n".join(lines)
@@ -0,0 +1,112 @@
+"""
+Beacon tracker with RSSI smoothing, distance estimation and presence events
+"""
+
+from array import array
+
+from . import const, ticks_diff, ticks_ms
+
+
+EVENT_ENTER = const(1)
+EVENT_UPDATE = const(2)
+EVENT_EXIT = const(3)
+
+_NAN = float("nan")
+
+
+class BeaconTracker:
+    """
+    Track the presence of beacons by key, i.e. the device address. The state
+    of each beacon is kept in a fixed number of slots: the last seen time,
+    the RSSI smoothed with an exponential moving average and the distance
+    estimated from the reference RSSI of the beacon. Updates are O(1).
+    """
+
+    def __init__(self, capacity=256, timeout_ms=30_000, *, alpha=0.3, path_loss=2.0):
+        self.capacity = capacity
+        self.timeout_ms = timeout_ms
+        self.alpha = alpha  # Smoothing factor, higher values follow faster
+        self.path_loss = path_loss  # Environmental path loss exponent
+        self.dropped = 0
+
+        self._slots = {}  # key -> slot
+        self._free = list(range(capacity - 1, -1, -1))
+        self._beacons = [None] * capacity
+        self._last_seen = [0] * capacity
+        self._rssi = array("f", [0] * capacity)
+        self._distance = array("f", [0] * capacity)
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, key):
+        return key in self._slots
+
+    def update(self, key, beacon, rssi, now=None):
+        """
+        Update the beacon state with a new sighting and return EVENT_ENTER for
+        a new beacon, EVENT_UPDATE for a known beacon or None if the tracker
+        is full and the beacon was dropped
+        """
+        if now is None:
+            now = ticks_ms()
+
+        slot = self._slots.get(key)
+        if slot is None:
+            if not self._free:
+                self.dropped += 1
+                return None
+            slot = self._free.pop()
+            self._slots[key] = slot
+            self._rssi[slot] = rssi
+            event = EVENT_ENTER
+        else:
+            self._rssi[slot] += self.alpha * (rssi - self._rssi[slot])
+            event = EVENT_UPDATE
+
+        self._beacons[slot] = beacon
+        self._last_seen[slot] = now
+
+        reference_rssi = getattr(beacon, "reference_rssi", None)
+        if reference_rssi is None:
+            self._distance[slot] = _NAN
+        else:
+            reference_rssi -= beacon._REFERENCE_LOSS_1M
+            self._distance[slot] = 10 ** (
+                (reference_rssi - self._rssi[slot]) / (10 * self.path_loss)
+            )
+
+        return event
+
+    def expire(self, now=None):
+        """
+        Remove beacons not seen for timeout_ms and return a list of
+        (EVENT_EXIT, key, beacon) events for them
+        """
+        if now is None:
+            now = ticks_ms()
+
+        events = []
+        for key, slot in list(self._slots.items()):
+            if ticks_diff(now, self._last_seen[slot]) >= self.timeout_ms:
+                events.append((EVENT_EXIT, key, self._beacons[slot]))
+                del self._slots[key]
+                self._beacons[slot] = None
+                self._free.append(slot)
+        return events
+
+    def beacon(self, key):
+        """Get the last beacon object of the key"""
+        return self._beacons[self._slots[key]]
+
+    def rssi(self, key):
+        """Get the smoothed RSSI of the beacon"""
+        return self._rssi[self._slots[key]]
+
+    def distance(self, key):
+        """Get the estimated distance in meters, NaN if it is unknown"""
+        return self._distance[self._slots[key]]
+
+    def last_seen(self, key):
+        """Get the ticks in milliseconds the beacon was last seen"""
+        return self._last_seen[self._slots[key]]